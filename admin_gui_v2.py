@@ -10,6 +10,10 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, simpledialog
 import threading
 import time
+import uuid
+import itertools
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import json
 
@@ -21,6 +25,9 @@ from fsdp.protocol.fsdp_protocol import FSDPProtocol, MessageType
 from fsdp.protocol.session_manager import SessionManager
 
 class FSDPAdminGUI:
+    # Maximum lines kept in the activity log
+    LOG_MAX_LINES = 2000
+    
     def __init__(self, root):
         self.root = root
         self.root.title("FSDP Admin Control Panel v2")
@@ -48,10 +55,50 @@ class FSDPAdminGUI:
         self.current_session = None
         self.current_terminal = None
         self.targets = {}
-        self.running = False
+        self._stop = threading.Event()  # Set once the window is closing
+        
+        # Per-field target tables read on every refresh; self.targets keeps
+        # the full detail record used by the info dialog
+        self._target_last_seen = {}
+        self._target_display = {}
+        
+        # Index of the last block scanned for target discovery, and the chain
+        # tip seen by the last auto-refresh
+        self._last_scanned_block = -1
+        self._last_auto_tip = None
+        
+        # Last values shown per treeview row (iid -> values)
+        self._target_rows = {}
+        self._session_rows = {}
+        
+        # Rendered session rows: session_id -> ((is_connected, terminal count), values)
+        self._session_display = {}
+        
+        # (tip index, result) of the last chain validation, and the tip being validated
+        self._chain_valid_cache = None
+        self._validating_tip = None
+        
+        # Blockchain tab rendering: last shown text and its key, and the key
+        # being rendered in the background
+        self._blockchain_render_cache = ""
+        self._blockchain_rendered_key = None
+        self._blockchain_rendering_key = None
+        
+        # Session/terminal IDs: counter plus a random suffix so they never
+        # repeat within a run or clash with sessions persisted by earlier runs
+        self._id_counter = itertools.count()
+        
+        # Running transaction total and the last block counted into it
+        self._tx_count_cache = 0
+        self._tx_count_last_block = -1
+        
+        # Commands run on a single worker so they keep their order
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._result_queue = queue.Queue()
         
         self.setup_ui()
         self.start_protocol()
+        self._pump_results()
         
     def setup_ui(self):
         """Setup the user interface"""
@@ -274,119 +321,229 @@ class FSDPAdminGUI:
     def start_protocol(self):
         """Start FSDP protocol"""
         self.protocol.start()
-        self.running = True
         self.log("✓ FSDP Protocol started")
         self.log(f"✓ Admin Node ID: {self.node_id}")
         self.log(f"✓ Connected to validator: {self.validator_address}")
         
-        # Start background update thread
-        self.update_thread = threading.Thread(target=self.background_update, daemon=True)
-        self.update_thread.start()
-        
         # Auto-refresh every 5 seconds
         self.auto_refresh()
         
     def auto_refresh(self):
         """Auto-refresh data"""
-        if self.running:
-            self.discover_targets()
+        if not self._stop.is_set():
+            # Only rescan when the chain has advanced
+            tip = self.blockchain.chain[-1].index if self.blockchain.chain else -1
+            if tip != self._last_auto_tip:
+                self.discover_targets()
+                self._last_auto_tip = tip
             self.root.after(5000, self.auto_refresh)
             
-    def background_update(self):
-        """Background thread to update data"""
-        while self.running:
-            try:
-                time.sleep(2)
-            except Exception as e:
-                print(f"Background update error: {e}")
-                
     def discover_targets(self):
         """Discover connected targets from blockchain"""
         try:
-            # Get all blocks and look for target registrations
-            for block in self.blockchain.chain:
-                for tx in block.data.get('transactions', []):
-                    if tx.get('type') == 'heartbeat' or tx.get('type') == 'register':
-                        sender = tx.get('from')
-                        if sender and sender != self.node_id and 'validator' not in sender:
-                            data = tx.get('data', {})
-                            
-                            # Update or add target
-                            self.targets[sender] = {
-                                'target_id': sender,
-                                'hostname': data.get('hostname', 'Unknown'),
-                                'ip': data.get('ip_address', 'Unknown'),
-                                'platform': data.get('platform', 'Unknown'),
-                                'status': 'Online',
-                                'last_seen': time.time()
-                            }
+            chain = self.blockchain.chain
+            
+            # Chain got shorter (replaced by sync): rescan from the start
+            if self._last_scanned_block >= len(chain):
+                self.invalidate_target_scan()
+            
+            # Only look at blocks added since the last scan; keep just the
+            # latest heartbeat/register payload per sender
+            self_node = self.node_id
+            latest = {}
+            for block in chain[self._last_scanned_block + 1:]:
+                txs = block.data.get('transactions')
+                if not txs:
+                    continue
+                for tx in txs:
+                    tx_type = tx.get('type')
+                    if tx_type != 'heartbeat' and tx_type != 'register':
+                        continue
+                    sender = tx.get('from')
+                    if not sender or sender == self_node or 'validator' in sender:
+                        continue
+                    latest[sender] = tx.get('data') or {}
+            
+            # Update or add targets and render their treeview rows once per
+            # updated target, not per refresh
+            now = time.time()
+            targets = self.targets
+            last_seen = self._target_last_seen
+            display = self._target_display
+            seen_str = datetime.fromtimestamp(now).strftime('%H:%M:%S')
+            for sender, data in latest.items():
+                hostname = data.get('hostname', 'Unknown')
+                ip = data.get('ip_address', 'Unknown')
+                platform = data.get('platform', 'Unknown')
+                targets[sender] = {
+                    'target_id': sender,
+                    'hostname': hostname,
+                    'ip': ip,
+                    'platform': platform,
+                    'status': 'Online'
+                }
+                last_seen[sender] = now
+                display[sender] = (
+                    sender[:32] + '...' if len(sender) > 32 else sender,
+                    hostname,
+                    ip,
+                    platform,
+                    'Online',
+                    seen_str
+                )
+            
+            self._last_scanned_block = chain[-1].index
                             
         except Exception as e:
             print(f"Discover targets error: {e}")
             
+    def invalidate_target_scan(self):
+        """Force the next discover_targets call to rescan the whole chain"""
+        self._last_scanned_block = -1
+            
     def refresh_dashboard(self):
         """Refresh dashboard statistics"""
-        self.stats_targets.config(text=str(len(self.targets)))
+        self.stats_targets.config(text=str(len(self._target_last_seen)))
         self.stats_sessions.config(text=str(len(self.session_manager.sessions)))
         self.stats_blockchain.config(text=str(self.blockchain.get_chain_length()))
         
-        # Count transactions
-        total_tx = sum(len(block.data.get('transactions', [])) for block in self.blockchain.chain)
-        self.stats_transactions.config(text=str(total_tx))
+        # Count transactions in blocks added since the last refresh
+        chain = self.blockchain.chain
+        if self._tx_count_last_block >= len(chain):
+            # Chain was replaced by a shorter one: recount
+            self._tx_count_cache = 0
+            self._tx_count_last_block = -1
+        for block in chain[self._tx_count_last_block + 1:]:
+            self._tx_count_cache += len(block.data.get('transactions', []))
+        self._tx_count_last_block = chain[-1].index
+        self.stats_transactions.config(text=str(self._tx_count_cache))
         
         self.log("Dashboard refreshed")
         
     def refresh_targets(self):
         """Refresh targets list"""
-        # Clear tree
-        for item in self.targets_tree.get_children():
-            self.targets_tree.delete(item)
-        
-        # Add targets
-        for target_id, info in self.targets.items():
-            last_seen = datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%H:%M:%S')
-            self.targets_tree.insert('', 'end', values=(
-                target_id[:32] + '...' if len(target_id) > 32 else target_id,
-                info.get('hostname', 'Unknown'),
-                info.get('ip', 'Unknown'),
-                info.get('platform', 'Unknown'),
-                info.get('status', 'Unknown'),
-                last_seen
-            ))
-        
-        self.log(f"Targets refreshed: {len(self.targets)} found")
+        self._sync_tree(self.targets_tree, self._target_display, self._target_rows)
+        
+        self.log(f"Targets refreshed: {len(self._target_display)} found")
         self.refresh_dashboard()
         
     def refresh_sessions(self):
         """Refresh sessions list"""
-        # Clear tree
-        for item in self.sessions_tree.get_children():
-            self.sessions_tree.delete(item)
-        
-        # Add sessions
+        rows = {}
         for session_id, session in self.session_manager.sessions.items():
-            created = datetime.fromtimestamp(session.created_at).strftime('%H:%M:%S')
-            self.sessions_tree.insert('', 'end', values=(
-                session_id[:24] + '...' if len(session_id) > 24 else session_id,
-                session.target_id[:24] + '...' if len(session.target_id) > 24 else session.target_id,
-                'Active' if session.is_connected else 'Disconnected',
-                len(session.terminals),
-                created
-            ))
+            # Re-render a row only when its status or terminal count changes
+            key = (session.is_connected, len(session.terminals))
+            cached = self._session_display.get(session_id)
+            if cached is None or cached[0] != key:
+                created = datetime.fromtimestamp(session.created_at).strftime('%H:%M:%S')
+                cached = (key, (
+                    session_id[:24] + '...' if len(session_id) > 24 else session_id,
+                    session.target_id[:24] + '...' if len(session.target_id) > 24 else session.target_id,
+                    'Active' if session.is_connected else 'Disconnected',
+                    len(session.terminals),
+                    created
+                ))
+                self._session_display[session_id] = cached
+            rows[session_id] = cached[1]
+        
+        # Forget rendered rows of sessions that are gone
+        if len(self._session_display) > len(rows):
+            self._session_display = {sid: v for sid, v in self._session_display.items() if sid in rows}
+        
+        self._sync_tree(self.sessions_tree, rows, self._session_rows)
         
         self.log(f"Sessions refreshed: {len(self.session_manager.sessions)} found")
         
+    def _sync_tree(self, tree, rows, cache):
+        """
+        Update a treeview to match rows (iid -> values)
+        Only inserts new rows, deletes vanished rows and updates changed rows
+        """
+        existing = set(tree.get_children())
+        
+        for iid in existing - rows.keys():
+            tree.delete(iid)
+            cache.pop(iid, None)
+            
+        for iid, values in rows.items():
+            if iid not in existing:
+                tree.insert('', 'end', iid=iid, values=values)
+            elif cache.get(iid) != values:
+                tree.item(iid, values=values)
+            cache[iid] = values
+        
     def refresh_blockchain(self):
         """Refresh blockchain information"""
-        self.blockchain_text.delete('1.0', tk.END)
+        # Validation rehashes every block: reuse the result for the same tip,
+        # otherwise run it in the background and show a placeholder
+        tip = self.blockchain.chain[-1].index
+        if self._chain_valid_cache and self._chain_valid_cache[0] == tip:
+            chain_valid = self._chain_valid_cache[1]
+        else:
+            chain_valid = "validating..."
+            self._start_chain_validation(tip)
+        
+        # Nothing changed since the last render
+        key = (tip, len(self.blockchain.pending_transactions), chain_valid)
+        if key == self._blockchain_rendered_key:
+            self.log("Blockchain refreshed")
+            return
+        
+        # Show the previous rendering right away while the new one is built
+        if self._blockchain_render_cache:
+            self._show_blockchain_text("(refreshing...)\n" + self._blockchain_render_cache)
+        
+        if self._blockchain_rendering_key != key:
+            self._blockchain_rendering_key = key
+            
+            def render():
+                try:
+                    text = self._render_blockchain(chain_valid)
+                except Exception as e:
+                    text = f"Error rendering blockchain: {e}\n"
+                self.root.after(0, self._blockchain_rendered, key, text)
+                
+            threading.Thread(target=render, daemon=True).start()
+        
+        self.log("Blockchain refreshed")
+        
+    def _start_chain_validation(self, tip):
+        """Validate the chain in a worker thread and hand the result back via after()"""
+        if self._validating_tip == tip:
+            return
+        self._validating_tip = tip
+        
+        def validate():
+            try:
+                valid = self.blockchain.is_chain_valid()
+            except Exception as e:
+                print(f"Chain validation error: {e}")
+                valid = False
+            self.root.after(0, self._chain_validated, tip, valid)
+            
+        threading.Thread(target=validate, daemon=True).start()
+        
+    def _chain_validated(self, tip, valid):
+        """Store a finished validation and redraw the blockchain tab (Tk thread)"""
+        if self._validating_tip == tip:
+            self._validating_tip = None
         
+        # A slower validation of an older tip must not replace a newer result
+        if self._chain_valid_cache is None or tip >= self._chain_valid_cache[0]:
+            self._chain_valid_cache = (tip, valid)
+        
+        if tip == self.blockchain.chain[-1].index:
+            self.refresh_blockchain()
+        
+    def _render_blockchain(self, chain_valid):
+        """Build the blockchain tab text (runs in a worker thread)"""
         info = f"""
 Blockchain Statistics
 {'='*60}
 
 Chain Length: {self.blockchain.get_chain_length()}
 Pending Transactions: {len(self.blockchain.pending_transactions)}
-Chain Valid: {self.blockchain.is_chain_valid()}
+Chain Valid: {chain_valid}
 Node ID: {self.node_id}
 Validator Address: {self.validator_address}
 
@@ -394,7 +551,7 @@ Recent Blocks:
 {'='*60}
 
 """
-        self.blockchain_text.insert(tk.END, info)
+        parts = [info]
         
         # Show last 10 blocks
         for block in self.blockchain.chain[-10:]:
@@ -406,14 +563,29 @@ Block #{block.index}
   Transactions: {len(block.data.get('transactions', []))}
   
 """
-            self.blockchain_text.insert(tk.END, block_info)
-            
-            # Show transactions
-            for tx in block.data.get('transactions', []):
-                tx_info = f"    - {tx.get('type', 'unknown')} from {tx.get('from', 'unknown')[:16]}...\n"
-                self.blockchain_text.insert(tk.END, tx_info)
+            parts.append(block_info)
+            parts.extend(
+                f"    - {tx.get('type', 'unknown')} from {tx.get('from', 'unknown')[:16]}...\n"
+                for tx in block.data.get('transactions', [])
+            )
+        
+        return "".join(parts)
+        
+    def _blockchain_rendered(self, key, text):
+        """Swap in a finished blockchain rendering (Tk thread)"""
+        if self._blockchain_rendering_key != key:
+            # Superseded by a newer render; nothing is kept
+            return
         
-        self.log("Blockchain refreshed")
+        self._blockchain_rendering_key = None
+        self._blockchain_rendered_key = key
+        self._blockchain_render_cache = text
+        self._show_blockchain_text(text)
+        
+    def _show_blockchain_text(self, text):
+        """Replace the blockchain tab contents"""
+        self.blockchain_text.delete('1.0', tk.END)
+        self.blockchain_text.insert(tk.END, text)
         
     def show_target_info(self):
         """Show detailed target information"""
@@ -422,15 +594,8 @@ Block #{block.index}
             messagebox.showwarning("No Selection", "Please select a target first")
             return
         
-        item = self.targets_tree.item(selection[0])
-        target_id_short = item['values'][0].replace('...', '')
-        
-        # Find full target ID
-        target_id = None
-        for tid in self.targets.keys():
-            if tid.startswith(target_id_short) or target_id_short in tid:
-                target_id = tid
-                break
+        # Rows are keyed by full target ID
+        target_id = selection[0] if selection[0] in self.targets else None
         
         if target_id and target_id in self.targets:
             info = self.targets[target_id]
@@ -441,7 +606,7 @@ Hostname: {info.get('hostname', 'Unknown')}
 IP Address: {info.get('ip', 'Unknown')}
 Platform: {info.get('platform', 'Unknown')}
 Status: {info.get('status', 'Unknown')}
-Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d %H:%M:%S')}
+Last Seen: {datetime.fromtimestamp(self._target_last_seen.get(target_id, 0)).strftime('%Y-%m-%d %H:%M:%S')}
 """
             messagebox.showinfo("Target Information", msg)
         
@@ -452,22 +617,15 @@ Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d
             messagebox.showwarning("No Selection", "Please select a target first")
             return
         
-        item = self.targets_tree.item(selection[0])
-        target_id_short = item['values'][0].replace('...', '')
-        
-        # Find full target ID
-        target_id = None
-        for tid in self.targets.keys():
-            if tid.startswith(target_id_short) or target_id_short in tid:
-                target_id = tid
-                break
+        # Rows are keyed by full target ID
+        target_id = selection[0] if selection[0] in self.targets else None
         
         if not target_id:
             messagebox.showerror("Error", "Could not find target ID")
             return
         
         # Create session
-        session_id = f"session-{int(time.time())}"
+        session_id = f"session-{next(self._id_counter):08x}-{uuid.uuid4().hex[:8]}"
         session = self.session_manager.create_session(
             session_id=session_id,
             admin_id=self.node_id,
@@ -491,7 +649,7 @@ Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d
             messagebox.showwarning("No Session", "Please open a session first from the Targets tab")
             return
         
-        terminal_id = f"terminal-{int(time.time())}"
+        terminal_id = f"terminal-{next(self._id_counter):08x}-{uuid.uuid4().hex[:8]}"
         
         session = self.session_manager.sessions.get(self.current_session)
         if not session:
@@ -532,19 +690,35 @@ Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d
         # Execute locally (for demo - in production this would send to target)
         terminal = session.terminals.get(self.current_terminal)
         if terminal:
-            try:
-                result = terminal.execute_command(command)
+            future = self._executor.submit(terminal.execute_command, command)
+            future.add_done_callback(lambda f: self._result_queue.put((command, f)))
+        else:
+            self.terminal_write("\n$ ")
+        
+    def _pump_results(self):
+        """Write finished command results to the terminal"""
+        try:
+            while True:
+                command, future = self._result_queue.get_nowait()
                 
-                if result['output']:
-                    self.terminal_write(result['output'])
-                if result['error']:
-                    self.terminal_write(f"ERROR: {result['error']}\n")
+                # Collect the results so the terminal is written once
+                parts = []
+                try:
+                    result = future.result()
+                    if result['output']:
+                        parts.append(result['output'])
+                    if result['error']:
+                        parts.append(f"ERROR: {result['error']}\n")
+                    self.log(f"Command executed: {command[:30]}...")
+                except Exception as e:
+                    parts.append(f"ERROR: {str(e)}\n")
                 
-                self.log(f"Command executed: {command[:30]}...")
-            except Exception as e:
-                self.terminal_write(f"ERROR: {str(e)}\n")
+                parts.append("\n$ ")
+                self.terminal_write("".join(parts))
+        except queue.Empty:
+            pass
         
-        self.terminal_write("\n$ ")
+        self.root.after(50, self._pump_results)
         
     def clear_terminal(self):
         """Clear terminal output"""
@@ -563,15 +737,8 @@ Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d
             messagebox.showwarning("No Selection", "Please select a session first")
             return
         
-        item = self.sessions_tree.item(selection[0])
-        session_id_short = item['values'][0].replace('...', '')
-        
-        # Find full session ID
-        session_id = None
-        for sid in self.session_manager.sessions.keys():
-            if sid.startswith(session_id_short) or session_id_short in sid:
-                session_id = sid
-                break
+        # Rows are keyed by full session ID
+        session_id = selection[0] if selection[0] in self.session_manager.sessions else None
         
         if session_id:
             self.session_manager.close_session(session_id)
@@ -591,16 +758,26 @@ Last Seen: {datetime.fromtimestamp(info.get('last_seen', 0)).strftime('%Y-%m-%d
         log_message = f"[{timestamp}] {message}\n"
         
         self.log_text.config(state='normal')
-        self.log_text.insert(tk.END, log_message)
-        self.log_text.see(tk.END)
+        self._append_capped(self.log_text, log_message, self.LOG_MAX_LINES)
         self.log_text.config(state='disabled')
         
         self.status_bar.config(text=message)
         
+    def _append_capped(self, widget, text, max_lines):
+        """Append text to a text widget, dropping the oldest lines past max_lines"""
+        widget.insert(tk.END, text)
+        
+        excess = int(float(widget.index('end-1c'))) - max_lines
+        if excess > 0:
+            widget.delete('1.0', f'{excess + 1}.0')
+        
+        widget.see(tk.END)
+        
     def on_closing(self):
         """Handle window closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit FSDP Admin?"):
-            self.running = False
+            self._stop.set()
+            self._executor.shutdown(wait=False)
             self.protocol.stop()
             self.session_manager.shutdown()
             self.root.destroy()
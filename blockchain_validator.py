@@ -15,14 +15,21 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from fsdp.blockchain.chain import FSDPBlockchain
 from fsdp.protocol.fsdp_protocol import FSDPProtocol
 
+_LOCAL_IP_CACHE = None
+
 def get_local_ip():
-    """Get local IP address"""
+    """Get local IP address (cached after the first successful lookup)"""
+    global _LOCAL_IP_CACHE
+    if _LOCAL_IP_CACHE:
+        return _LOCAL_IP_CACHE
+    
     try:
         # Create a socket to determine local IP
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
         ip = s.getsockname()[0]
         s.close()
+        _LOCAL_IP_CACHE = ip
         return ip
     except Exception:
         return "127.0.0.1"
@@ -70,15 +77,16 @@ def main():
     print("=" * 70)
     
     try:
-        # Keep validator running
+        # Keep validator running, waking as soon as transactions arrive
         while True:
-            time.sleep(1)
+            blockchain.wait_for_transactions(timeout=5.0)
             
-            # Periodically create blocks if there are pending transactions
-            if len(blockchain.pending_transactions) > 0:
+            # Drain the pending pool into blocks
+            while len(blockchain.pending_transactions) > 0:
                 block = blockchain.create_block()
-                if block:
-                    print(f"[{time.strftime('%H:%M:%S')}] Block #{block.index} created with {len(block.data['transactions'])} transactions")
+                if not block:
+                    break
+                print(f"[{time.strftime('%H:%M:%S')}] Block #{block.index} created with {len(block.data['transactions'])} transactions")
                     
     except KeyboardInterrupt:
         print()
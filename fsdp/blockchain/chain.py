@@ -4,42 +4,44 @@ Lightweight blockchain optimized for real-time RAT communication
 Uses Proof of Authority (PoA) consensus for fast, zero-fee transactions
 """
 
+import sys
 import hashlib
 import json
 import time
-from typing import List, Dict, Any, Optional
+import bisect
+from typing import List, Dict, Any, Optional, Set, Tuple
 import threading
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
 class Block:
     """Represents a single block in the blockchain"""
     
+    __slots__ = ('index', 'timestamp', 'data', 'previous_hash', 'validator', 'hash')
+    
     def __init__(self, index: int, timestamp: float, data: Dict[Any, Any], 
                  previous_hash: str, validator: str):
         self.index = index
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
-        self.validator = validator  # PoA: node that validated this block
+        self.validator = sys.intern(validator)  # PoA: node that validated this block
         self.hash = self.calculate_hash()
         
-    def calculate_hash(self) -> str:
-        """Calculate SHA-256 hash of the block"""
-        block_string = json.dumps({
+    def _serialize(self) -> bytes:
+        """Canonical serialization of the block contents used for hashing"""
+        return json.dumps({
             'index': self.index,
             'timestamp': self.timestamp,
             'data': self.data,
             'previous_hash': self.previous_hash,
             'validator': self.validator
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        }, sort_keys=True).encode()
+        
+    def calculate_hash(self) -> str:
+        """Calculate SHA-256 hash of the block"""
+        # Always re-serialize: data is a live dict, and validation relies on
+        # this detecting changes made after the block was created
+        return hashlib.sha256(self._serialize()).hexdigest()
     
     def to_dict(self) -> Dict:
         """Convert block to dictionary"""
@@ -53,6 +55,14 @@ class Block:
         }
 
 
+def _intern_transaction(transaction: Dict):
+    """Intern the short, heavily repeated string fields of a transaction"""
+    for key in ('type', 'from', 'to'):
+        value = transaction.get(key)
+        if isinstance(value, str):
+            transaction[key] = sys.intern(value)
+
+
 class FSDPBlockchain:
     """
     FSDP Private Blockchain
@@ -67,8 +77,13 @@ class FSDPBlockchain:
         self.pending_transactions: List[Dict] = []
         self.node_id = node_id
         self.is_validator = is_validator
-        self.validators: List[str] = []  # List of authorized validator nodes
+        self.validators: Set[str] = set()  # Authorized validator nodes
         self.lock = threading.Lock()
+        self._pending_event = threading.Event()  # Set when a transaction arrives
+        self._block_added = threading.Condition(self.lock)  # Notified when the chain grows
+        self._last_valid_index = 0  # Highest block index already validated
+        # Per-recipient index: node_id -> (block indexes, transactions), in chain order
+        self._by_recipient: Dict[str, Tuple[List[int], List[Dict]]] = {}
         self.logger = logging.getLogger(f"FSDPBlockchain-{node_id}")
         
         # Create genesis block
@@ -91,14 +106,16 @@ class FSDPBlockchain:
         """Add a node as an authorized validator (PoA)"""
         with self.lock:
             if validator_id not in self.validators:
-                self.validators.append(validator_id)
+                self.validators.add(validator_id)
                 self.logger.info(f"Added validator: {validator_id}")
                 
     def remove_validator(self, validator_id: str):
         """Remove a validator"""
         with self.lock:
             if validator_id in self.validators:
-                self.validators.remove(validator_id)
+                self.validators.discard(validator_id)
+                # Blocks signed by this validator must be checked again
+                self._last_valid_index = 0
                 self.logger.info(f"Removed validator: {validator_id}")
                 
     def add_transaction(self, transaction: Dict) -> bool:
@@ -112,11 +129,19 @@ class FSDPBlockchain:
             'timestamp': float
         }
         """
+        transaction['timestamp'] = time.time()
+        _intern_transaction(transaction)
         with self.lock:
-            transaction['timestamp'] = time.time()
             self.pending_transactions.append(transaction)
-            self.logger.debug(f"Transaction added: {transaction['type']} from {transaction.get('from')} to {transaction.get('to')}")
-            return True
+        self.logger.debug("Transaction added: %s from %s to %s", transaction['type'], transaction.get('from'), transaction.get('to'))
+        self._pending_event.set()
+        return True
+            
+    def wait_for_transactions(self, timeout: Optional[float] = None) -> bool:
+        """Block until a transaction is added or the timeout expires"""
+        signalled = self._pending_event.wait(timeout)
+        self._pending_event.clear()
+        return signalled
             
     def create_block(self) -> Optional[Block]:
         """
@@ -132,62 +157,128 @@ class FSDPBlockchain:
                 return None
                 
             previous_block = self.get_last_block()
-            new_block = Block(
-                index=len(self.chain),
-                timestamp=time.time(),
-                data={'transactions': self.pending_transactions.copy()},
-                previous_hash=previous_block.hash,
-                validator=self.node_id
-            )
+            # Hand the pending list to the block and start a fresh one
+            transactions = self.pending_transactions
+            self.pending_transactions = []
             
+        # Hash the new block outside the lock so producers are not blocked
+        new_block = Block(
+            index=previous_block.index + 1,
+            timestamp=time.time(),
+            data={'transactions': transactions},
+            previous_hash=previous_block.hash,
+            validator=self.node_id
+        )
+        
+        with self.lock:
+            if self.get_last_block() is not previous_block:
+                # Chain changed underneath us; return the transactions to the pool
+                self.pending_transactions[:0] = transactions
+                self.logger.warning("Chain changed during block creation, retrying later")
+                return None
+            # Index before publishing: readers that see the block in the
+            # chain without taking the lock must also find its transactions
+            self._index_block(new_block)
             self.chain.append(new_block)
-            self.logger.info(f"Block #{new_block.index} created with {len(self.pending_transactions)} transactions")
+            self._block_added.notify_all()
             
-            # Clear pending transactions
-            self.pending_transactions.clear()
+        self.logger.info(f"Block #{new_block.index} created with {len(transactions)} transactions")
+        return new_block
             
-            return new_block
+    def wait_for_block(self, after_index: int, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Block until the chain extends past after_index or the timeout expires
+        Returns the tip index seen under the lock, or None on timeout
+        """
+        with self._block_added:
+            if not self._block_added.wait_for(lambda: self.chain[-1].index > after_index, timeout):
+                return None
+            return self.chain[-1].index
             
     def get_last_block(self) -> Block:
         """Get the last block in the chain"""
         return self.chain[-1]
         
     def is_chain_valid(self) -> bool:
-        """Validate the entire blockchain"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
+        """Validate the entire blockchain, rehashing every block"""
+        return self._validate_from(1)
+        
+    def validate_new_blocks(self) -> bool:
+        """
+        Validate only the blocks appended since the last successful validation
+        Changes to blocks validated earlier are not detected; use is_chain_valid
+        """
+        return self._validate_from(self._last_valid_index + 1)
+        
+    def _validate_from(self, start: int) -> bool:
+        """Validate the blocks from start to the tip and record how far they are valid"""
+        chain = self.chain
+        for i in range(start, len(chain)):
+            current_block = chain[i]
+            previous_block = chain[i - 1]
             
             # Check if hash is correct
             if current_block.hash != current_block.calculate_hash():
                 self.logger.error(f"Invalid hash at block {i}")
-                return False
+                break
                 
             # Check if previous hash matches
             if current_block.previous_hash != previous_block.hash:
                 self.logger.error(f"Invalid previous hash at block {i}")
-                return False
+                break
                 
             # Check if validator is authorized (PoA)
             if current_block.validator not in self.validators and current_block.validator != 'genesis':
                 self.logger.error(f"Unauthorized validator at block {i}: {current_block.validator}")
-                return False
+                break
                 
-        return True
+            self._last_valid_index = max(self._last_valid_index, i)
+        else:
+            return True
+            
+        # Blocks from i on are no longer known to be valid
+        self._last_valid_index = min(self._last_valid_index, i - 1)
+        return False
         
-    def get_transactions_for_node(self, node_id: str, since_block: int = 0) -> List[Dict]:
+    def _index_block(self, block: Block, index: Optional[Dict] = None):
+        """Add a block's transactions to the per-recipient index"""
+        if index is None:
+            index = self._by_recipient
+        for tx in block.data.get('transactions', ()):
+            entry = index.get(tx.get('to'))
+            if entry is None:
+                entry = index[tx.get('to')] = ([], [])
+            # Block index first so concurrent readers never see a tx without one
+            entry[0].append(block.index)
+            entry[1].append(tx)
+            
+    def _rebuild_index(self, chain: List[Block]):
+        """Rebuild the per-recipient index from a chain about to be published"""
+        index = {}
+        for block in chain:
+            self._index_block(block, index)
+        self._by_recipient = index
+        
+    def get_transactions_for_node(self, node_id: str, since_block: int = 0,
+                                  until_block: Optional[int] = None) -> List[Dict]:
         """
-        Get all transactions destined for a specific node since a block index
+        Get all transactions destined for a specific node since a block index,
+        up to and including until_block when given
         Used by nodes to read their messages from the blockchain
         """
-        transactions = []
-        for block in self.chain[since_block:]:
-            if 'transactions' in block.data:
-                for tx in block.data['transactions']:
-                    if tx.get('to') == node_id:
-                        tx['block_index'] = block.index
-                        transactions.append(tx)
-        return transactions
+        entry = self._by_recipient.get(node_id)
+        if entry is None:
+            return []
+            
+        block_indexes, txs = entry
+        start = bisect.bisect_left(block_indexes, since_block)
+        if until_block is None:
+            end = len(txs)
+        else:
+            end = bisect.bisect_right(block_indexes, until_block)
+        
+        # Return copies so the transactions stored in blocks are never mutated
+        return [dict(txs[i], block_index=block_indexes[i]) for i in range(start, end)]
         
     def get_chain_data(self) -> List[Dict]:
         """Get the entire chain as a list of dictionaries"""
@@ -205,6 +296,8 @@ class FSDPBlockchain:
         try:
             new_chain = []
             for block_data in chain_data:
+                for tx in block_data['data'].get('transactions', ()):
+                    _intern_transaction(tx)
                 block = Block(
                     index=block_data['index'],
                     timestamp=block_data['timestamp'],
@@ -217,7 +310,17 @@ class FSDPBlockchain:
             # Replace chain if new chain is valid and longer
             if len(new_chain) > len(self.chain):
                 with self.lock:
+                    # Keep validation state for the prefix both chains share
+                    common = 0
+                    for old_block, new_block in zip(self.chain, new_chain):
+                        if old_block.hash != new_block.hash:
+                            break
+                        common += 1
+                    self._last_valid_index = min(self._last_valid_index, max(common - 1, 0))
+                    # Index first, then publish the chain (see create_block)
+                    self._rebuild_index(new_chain)
                     self.chain = new_chain
+                    self._block_added.notify_all()
                     self.logger.info(f"Chain synchronized: {len(new_chain)} blocks")
                     return True
             return False
@@ -8,23 +8,23 @@ Implements chunked file transfer with verification
 """
 
 import os
+import sys
+import mmap
 import hashlib
 import time
 import logging
-from typing import Dict, Optional, Callable
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Callable, Union
+from dataclasses import dataclass, field
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 import base64
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
 # 4MB chunk size
 CHUNK_SIZE = 4 * 1024 * 1024  # 4 MB
 
+# Slotted dataclasses need Python 3.10+; older interpreters keep a __dict__
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 
 class TransferStatus(Enum):
     """File transfer status"""
@@ -35,7 +35,7 @@ class TransferStatus(Enum):
     VERIFYING = "verifying"
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class ChunkInfo:
     """Information about a file chunk"""
     chunk_index: int
@@ -44,7 +44,7 @@ class ChunkInfo:
     is_verified: bool = False
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class FileTransferInfo:
     """Information about a file transfer"""
     transfer_id: str
@@ -59,17 +59,18 @@ class FileTransferInfo:
     file_hash: Optional[str] = None
     direction: str = "upload"  # "upload" or "download"
     session_id: Optional[str] = None
+    source_map: Optional[mmap.mmap] = field(default=None, repr=False, compare=False)  # Read-only map of an upload's file
+    verified_count: int = 0  # Number of chunks with is_verified set
     
     def get_progress(self) -> float:
         """Get transfer progress percentage"""
         if self.total_chunks == 0:
             return 0.0
-        verified_chunks = sum(1 for c in self.chunks.values() if c.is_verified)
-        return (verified_chunks / self.total_chunks) * 100
+        return (self.verified_count / self.total_chunks) * 100
         
     def is_complete(self) -> bool:
         """Check if all chunks are verified"""
-        return all(c.is_verified for c in self.chunks.values())
+        return self.verified_count == len(self.chunks)
 
 
 class FileTransferManager:
@@ -88,14 +89,27 @@ class FileTransferManager:
         self.transfers: Dict[str, FileTransferInfo] = {}
         self.logger = logging.getLogger("FileTransferManager")
         self.progress_callbacks: Dict[str, Callable] = {}
+        self._output_fds: Dict[str, int] = {}  # Open output file per incoming transfer
         
     def calculate_file_hash(self, file_path: str) -> str:
         """Calculate SHA-256 hash of entire file"""
         sha256_hash = hashlib.sha256()
         try:
             with open(file_path, "rb") as f:
-                for byte_block in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(byte_block)
+                try:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OverflowError, OSError):
+                    # Empty files and files too large to map use buffered reads
+                    for byte_block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        sha256_hash.update(byte_block)
+                    return sha256_hash.hexdigest()
+                    
+                with data:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        data.madvise(mmap.MADV_SEQUENTIAL)
+                    with memoryview(data) as view:
+                        for start in range(0, len(data), CHUNK_SIZE):
+                            sha256_hash.update(view[start:start + CHUNK_SIZE])
             return sha256_hash.hexdigest()
         except Exception as e:
             self.logger.error(f"Error calculating file hash: {e}")
@@ -126,21 +140,27 @@ class FileTransferManager:
             file_name = os.path.basename(file_path)
             total_chunks = (file_size + CHUNK_SIZE - 1) // CHUNK_SIZE  # Ceiling division
             
-            # Calculate file hash
-            file_hash = self.calculate_file_hash(file_path)
-            
-            # Create chunk info
-            chunks = {}
-            with open(file_path, 'rb') as f:
+            # Hash the file in a single sequential pass while chunk hashes
+            # run on worker threads (hashlib releases the GIL)
+            file_sha = hashlib.sha256()
+            chunk_futures = []
+            with open(file_path, 'rb') as f, ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
                 for i in range(total_chunks):
                     chunk_data = f.read(CHUNK_SIZE)
-                    chunk_hash = self.calculate_chunk_hash(chunk_data)
-                    chunks[i] = ChunkInfo(
-                        chunk_index=i,
-                        chunk_hash=chunk_hash,
-                        chunk_size=len(chunk_data),
-                        is_verified=False
-                    )
+                    chunk_futures.append((len(chunk_data), pool.submit(self.calculate_chunk_hash, chunk_data)))
+                    file_sha.update(chunk_data)
+            file_hash = file_sha.hexdigest()
+            
+            chunks = {}
+            for i, (chunk_size, future) in enumerate(chunk_futures):
+                chunks[i] = ChunkInfo(
+                    chunk_index=i,
+                    chunk_hash=future.result(),
+                    chunk_size=chunk_size,
+                    is_verified=False
+                )
                     
             transfer_info = FileTransferInfo(
                 transfer_id=transfer_id,
@@ -224,10 +244,10 @@ class FileTransferManager:
             return False
             
         try:
-            # Read chunk from file
-            with open(transfer_info.file_path, 'rb') as f:
-                f.seek(chunk_index * CHUNK_SIZE)
-                chunk_data = f.read(CHUNK_SIZE)
+            # Slice chunk from the mapped file
+            source_map = self._get_source_map(transfer_info)
+            start = chunk_index * CHUNK_SIZE
+            chunk_data = source_map[start:start + CHUNK_SIZE]
                 
             chunk_info = transfer_info.chunks[chunk_index]
             
@@ -248,13 +268,29 @@ class FileTransferManager:
                 }
             )
             
-            self.logger.debug(f"Chunk sent: {transfer_id} chunk {chunk_index}/{transfer_info.total_chunks}")
+            self.logger.debug("Chunk sent: %s chunk %d/%d", transfer_id, chunk_index, transfer_info.total_chunks)
             return True
             
         except Exception as e:
             self.logger.error(f"Error sending chunk: {e}")
             return False
             
+    def _get_source_map(self, transfer_info: FileTransferInfo) -> mmap.mmap:
+        """Map the upload's file once and reuse it for every chunk"""
+        if transfer_info.source_map is None:
+            with open(transfer_info.file_path, 'rb') as f:
+                source_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                source_map.madvise(mmap.MADV_SEQUENTIAL)
+            transfer_info.source_map = source_map
+        return transfer_info.source_map
+        
+    def _close_source_map(self, transfer_info: FileTransferInfo):
+        """Release the upload's file mapping"""
+        if transfer_info.source_map is not None:
+            transfer_info.source_map.close()
+            transfer_info.source_map = None
+            
     def verify_chunk(self, transfer_id: str, chunk_index: int, chunk_hash: str) -> bool:
         """
         Verify a received chunk
@@ -275,8 +311,10 @@ class FileTransferManager:
         if chunk_index in transfer_info.chunks:
             chunk_info = transfer_info.chunks[chunk_index]
             if chunk_info.chunk_hash == chunk_hash:
-                chunk_info.is_verified = True
-                self.logger.debug(f"Chunk verified: {transfer_id} chunk {chunk_index}")
+                if not chunk_info.is_verified:
+                    chunk_info.is_verified = True
+                    transfer_info.verified_count += 1
+                self.logger.debug("Chunk verified: %s chunk %d", transfer_id, chunk_index)
                 
                 # Call progress callback
                 if transfer_id in self.progress_callbacks:
@@ -292,7 +330,74 @@ class FileTransferManager:
                 return False
         return False
         
-    def receive_chunk(self, transfer_id: str, chunk_index: int, chunk_data_b64: str, 
+    def _find_bad_chunks(self, chunks: List[ChunkInfo], file_path: str) -> List[ChunkInfo]:
+        """
+        Check chunks against the data in file_path without changing any state
+        
+        Returns:
+            The chunks that are missing from the file or do not match their hash
+        """
+        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+            return list(chunks)
+            
+        bad = []
+        try:
+            with open(file_path, 'rb') as f, \
+                 mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for chunk_info in chunks:
+                    start = chunk_info.chunk_index * CHUNK_SIZE
+                    chunk_data = data[start:start + chunk_info.chunk_size]
+                    if (len(chunk_data) != chunk_info.chunk_size or
+                            self.calculate_chunk_hash(chunk_data) != chunk_info.chunk_hash):
+                        bad.append(chunk_info)
+        except Exception as e:
+            self.logger.error(f"Error verifying chunks: {e}")
+            return list(chunks)
+        return bad
+        
+    def verify_all_chunks(self, transfer_id: str, file_path: str) -> int:
+        """
+        Verify every outstanding chunk against data already on disk
+        Used when resuming a transfer, so chunks that are already intact are
+        not re-sent; completes the transfer if nothing is left outstanding
+        
+        Args:
+            transfer_id: Transfer ID
+            file_path: Path to the partially received file
+            
+        Returns:
+            Number of chunks newly verified
+        """
+        if transfer_id not in self.transfers:
+            self.logger.error(f"Transfer not found: {transfer_id}")
+            return 0
+            
+        transfer_info = self.transfers[transfer_id]
+        pending = [c for c in transfer_info.chunks.values() if not c.is_verified]
+        if not pending:
+            return 0
+            
+        bad = {c.chunk_index for c in self._find_bad_chunks(pending, file_path)}
+        for chunk_info in pending:
+            if chunk_info.chunk_index not in bad:
+                chunk_info.is_verified = True
+        newly_verified = len(pending) - len(bad)
+        
+        transfer_info.verified_count += newly_verified
+        self.logger.info(f"Resumed transfer {transfer_id}: {newly_verified} chunks already on disk")
+        
+        if newly_verified:
+            # Call progress callback once for the whole batch
+            if transfer_id in self.progress_callbacks:
+                self.progress_callbacks[transfer_id](transfer_info.get_progress())
+                
+            # Chunks all match but extra trailing data means the file is not complete yet
+            if transfer_info.is_complete() and os.path.getsize(file_path) == transfer_info.file_size:
+                self._complete_transfer(transfer_id)
+                
+        return newly_verified
+        
+    def receive_chunk(self, transfer_id: str, chunk_index: int, chunk_data: Union[str, bytes], 
                      chunk_hash: str, output_path: str) -> bool:
         """
         Receive and save a chunk
@@ -300,7 +405,7 @@ class FileTransferManager:
         Args:
             transfer_id: Transfer ID
             chunk_index: Chunk index
-            chunk_data_b64: Base64 encoded chunk data
+            chunk_data: Raw chunk bytes, or the base64 text from a chunk message
             chunk_hash: Expected chunk hash
             output_path: Path to save the file
             
@@ -308,8 +413,9 @@ class FileTransferManager:
             True if chunk received and verified successfully
         """
         try:
-            # Decode chunk data
-            chunk_data = base64.b64decode(chunk_data_b64)
+            # Decode chunk data (raw bytes from in-process callers skip base64)
+            if isinstance(chunk_data, str):
+                chunk_data = base64.b64decode(chunk_data)
             
             # Verify chunk hash
             calculated_hash = self.calculate_chunk_hash(chunk_data)
@@ -317,26 +423,69 @@ class FileTransferManager:
                 self.logger.error(f"Chunk hash verification failed: {transfer_id} chunk {chunk_index}")
                 return False
                 
-            # Create output directory if needed
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Write chunk to file
-            mode = 'ab' if chunk_index > 0 else 'wb'
-            with open(output_path, mode) as f:
-                f.seek(chunk_index * CHUNK_SIZE)
-                f.write(chunk_data)
-                
-            # Mark chunk as verified
+            # Write chunk at its offset so chunks may arrive in any order
+            offset = chunk_index * CHUNK_SIZE
+            self._write_at(self._get_output_fd(transfer_id, output_path), chunk_data, offset)
+            
             if transfer_id in self.transfers:
+                # Mark chunk as verified
                 self.verify_chunk(transfer_id, chunk_index, chunk_hash)
                 
-            self.logger.debug(f"Chunk received and saved: {transfer_id} chunk {chunk_index}")
+            self.logger.debug("Chunk received and saved: %s chunk %d", transfer_id, chunk_index)
             return True
             
         except Exception as e:
             self.logger.error(f"Error receiving chunk: {e}")
             return False
             
+    def _open_output(self, output_path: str, truncate: bool = False) -> int:
+        """Open (creating if needed) an output file for positioned writes"""
+        # Create output directory if needed
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        return os.open(output_path, flags, 0o644)
+        
+    def _write_at(self, fd: int, data: bytes, offset: int):
+        """Write all of data at offset without relying on the file position"""
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(fd, view, offset)
+            else:
+                os.lseek(fd, offset, os.SEEK_SET)
+                written = os.write(fd, view)
+            view = view[written:]
+            offset += written
+            
+    def _get_output_fd(self, transfer_id: str, output_path: str) -> int:
+        """
+        Open a transfer's output file once and reuse it for every chunk
+        Closed when the transfer completes or by cleanup_transfer
+        """
+        fd = self._output_fds.get(transfer_id)
+        if fd is None:
+            transfer_info = self.transfers.get(transfer_id)
+            if transfer_info is not None:
+                fd = self._open_output(output_path)
+                # Preallocate (sparsely) to the final size, keeping resumed data
+                os.ftruncate(fd, transfer_info.file_size)
+            else:
+                # Unregistered transfer: the size is unknown and there is nothing
+                # to resume, so start empty rather than keep an older file's tail
+                fd = self._open_output(output_path, truncate=True)
+            self._output_fds[transfer_id] = fd
+        return fd
+        
+    def _close_output_fd(self, transfer_id: str):
+        """Close the transfer's output file if it is open"""
+        fd = self._output_fds.pop(transfer_id, None)
+        if fd is not None:
+            os.close(fd)
+            
     def _complete_transfer(self, transfer_id: str):
         """Mark transfer as completed"""
         if transfer_id not in self.transfers:
@@ -345,6 +494,8 @@ class FileTransferManager:
         transfer_info = self.transfers[transfer_id]
         transfer_info.status = TransferStatus.COMPLETED
         transfer_info.completed_at = time.time()
+        self._close_source_map(transfer_info)
+        self._close_output_fd(transfer_id)
         
         duration = transfer_info.completed_at - transfer_info.created_at
         speed_mbps = (transfer_info.file_size / (1024 * 1024)) / duration if duration > 0 else 0
@@ -358,10 +509,9 @@ class FileTransferManager:
         if transfer_info.session_id:
             session = self.protocol.sessions.get(transfer_info.session_id)
             if session:
-                target_node = session.target_id if self.protocol.node_type == 'admin' else session.admin_id
                 from .fsdp_protocol import MessageType
                 self.protocol.send_message(
-                    target_node,
+                    session.other_node,
                     MessageType.FILE_UPLOAD_COMPLETE if transfer_info.direction == 'upload' else MessageType.FILE_DOWNLOAD_COMPLETE,
                     {
                         'transfer_id': transfer_id,
@@ -401,8 +551,18 @@ class FileTransferManager:
             self.logger.info(f"File verification successful: {transfer_id}")
             return True
         else:
-            self.logger.error(f"File verification failed: {transfer_id}")
             transfer_info.status = TransferStatus.FAILED
+            
+            # Re-check every chunk against the file so only damaged ones are outstanding
+            chunks = list(transfer_info.chunks.values())
+            bad = {c.chunk_index for c in self._find_bad_chunks(chunks, file_path)}
+            for chunk_info in chunks:
+                chunk_info.is_verified = chunk_info.chunk_index not in bad
+            transfer_info.verified_count = len(chunks) - len(bad)
+            self.logger.error(f"File verification failed: {transfer_id} ({len(bad)} chunks damaged or missing)")
+            
+            if transfer_id in self.progress_callbacks:
+                self.progress_callbacks[transfer_id](transfer_info.get_progress())
             return False
             
     def get_transfer_info(self, transfer_id: str) -> Optional[FileTransferInfo]:
@@ -421,7 +581,9 @@ class FileTransferManager:
             
     def cleanup_transfer(self, transfer_id: str):
         """Remove transfer from memory"""
+        self._close_output_fd(transfer_id)
         if transfer_id in self.transfers:
+            self._close_source_map(self.transfers[transfer_id])
             del self.transfers[transfer_id]
             if transfer_id in self.progress_callbacks:
                 del self.progress_callbacks[transfer_id]
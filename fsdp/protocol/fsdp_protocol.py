@@ -6,7 +6,9 @@ Implements session management, command routing, and data transfer
 
 import json
 import time
+import random
 import uuid
+import itertools
 import logging
 from typing import Dict, List, Optional, Callable
 from enum import Enum
@@ -47,48 +49,73 @@ class MessageType(Enum):
     ERROR = "error"
 
 
+# Small integer IDs for message types; handlers are stored in lists indexed by
+# these so the listener hot path does one dict lookup per message
+_MSG_TYPE_IDS = {m: i for i, m in enumerate(MessageType)}
+_MSG_TYPE_ID_BY_VALUE = {m.value: i for m, i in _MSG_TYPE_IDS.items()}
+
+
 class FSDPSession:
     """Represents a persistent session between admin and target"""
     
-    def __init__(self, session_id: str, admin_id: str, target_id: str):
+    __slots__ = ('session_id', 'admin_id', 'target_id', 'created_at', 'last_heartbeat',
+                 'is_active', 'terminals', '_terminal_ids', 'other_node')
+    
+    # Shared by all sessions; a logger per session would be kept by logging forever
+    logger = logging.getLogger("FSDPSession")
+    
+    def __init__(self, session_id: str, admin_id: str, target_id: str, node_id: str):
         self.session_id = session_id
         self.admin_id = admin_id
         self.target_id = target_id
         self.created_at = time.time()
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = time.monotonic()  # Monotonic, so clock changes cannot expire sessions
         self.is_active = True
         self.terminals: Dict[str, Dict] = {}  # terminal_id -> terminal_info
-        self.logger = logging.getLogger(f"FSDPSession-{session_id[:8]}")
+        self._terminal_ids: Optional[tuple] = None  # Cached keys of terminals, reset on change
+        # Peer node ID as seen from node_id, the node that owns this session object
+        self.other_node = target_id if node_id == admin_id else admin_id
         
     def add_terminal(self, terminal_id: str, terminal_info: Dict):
         """Add a new isolated terminal to the session"""
         self.terminals[terminal_id] = terminal_info
-        self.logger.debug(f"Terminal added: {terminal_id}")
+        self._terminal_ids = None
+        self.logger.debug("Terminal added: %s (session %s)", terminal_id, self.session_id[:8])
         
     def remove_terminal(self, terminal_id: str):
         """Remove a terminal from the session"""
-        if terminal_id in self.terminals:
-            del self.terminals[terminal_id]
-            self.logger.debug(f"Terminal removed: {terminal_id}")
+        if self.terminals.pop(terminal_id, None) is not None:
+            self._terminal_ids = None
+            self.logger.debug("Terminal removed: %s (session %s)", terminal_id, self.session_id[:8])
             
     def update_heartbeat(self):
         """Update last heartbeat timestamp"""
-        self.last_heartbeat = time.time()
+        self.last_heartbeat = time.monotonic()
         
     def is_alive(self, timeout: int = 60) -> bool:
         """Check if session is still alive based on heartbeat"""
-        return (time.time() - self.last_heartbeat) < timeout
+        return (time.monotonic() - self.last_heartbeat) < timeout
         
-    def to_dict(self) -> Dict:
-        """Convert session to dictionary"""
+    def to_dict(self, clock_offset: Optional[float] = None) -> Dict:
+        """
+        Convert session to dictionary
+        
+        Args:
+            clock_offset: Wall-clock minus monotonic time; pass one value when
+                          converting many sessions to avoid reading both clocks each time
+        """
+        if clock_offset is None:
+            clock_offset = time.time() - time.monotonic()
+        if self._terminal_ids is None:
+            self._terminal_ids = tuple(self.terminals)
         return {
             'session_id': self.session_id,
             'admin_id': self.admin_id,
             'target_id': self.target_id,
             'created_at': self.created_at,
-            'last_heartbeat': self.last_heartbeat,
+            'last_heartbeat': self.last_heartbeat + clock_offset,
             'is_active': self.is_active,
-            'terminals': list(self.terminals.keys())
+            'terminals': list(self._terminal_ids)
         }
 
 
@@ -111,10 +138,15 @@ class FSDPProtocol:
         self.node_id = node_id
         self.node_type = node_type
         self.sessions: Dict[str, FSDPSession] = {}
-        self.message_handlers: Dict[MessageType, List[Callable]] = {}
+        self.message_handlers: List[Optional[List[Callable]]] = [None] * len(_MSG_TYPE_IDS)
+        self.batch_handlers: List[Optional[List[Callable]]] = [None] * len(_MSG_TYPE_IDS)
+        self._has_batch_handlers = False
         self.last_processed_block = 0
         self.running = False
         self.listener_thread = None
+        # Message IDs: one random prefix per protocol instance plus a counter
+        self._msg_prefix = uuid.uuid4().hex[:12]
+        self._msg_seq = itertools.count()
         self.logger = logging.getLogger(f"FSDPProtocol-{node_id}")
         
     def start(self):
@@ -134,44 +166,95 @@ class FSDPProtocol:
         
     def register_handler(self, message_type: MessageType, handler: Callable):
         """Register a callback handler for a specific message type"""
-        if message_type not in self.message_handlers:
-            self.message_handlers[message_type] = []
-        self.message_handlers[message_type].append(handler)
-        self.logger.debug(f"Handler registered for {message_type.value}")
+        type_id = _MSG_TYPE_IDS[message_type]
+        if self.message_handlers[type_id] is None:
+            self.message_handlers[type_id] = []
+        self.message_handlers[type_id].append(handler)
+        self.logger.debug("Handler registered for %s", message_type.value)
+        
+    def register_batch_handler(self, message_type: MessageType, handler: Callable):
+        """
+        Register a callback that receives a list of consecutive messages of one type
+        Used instead of the per-message handlers for that type
+        """
+        type_id = _MSG_TYPE_IDS[message_type]
+        if self.batch_handlers[type_id] is None:
+            self.batch_handlers[type_id] = []
+        self.batch_handlers[type_id].append(handler)
+        self._has_batch_handlers = True
+        self.logger.debug("Batch handler registered for %s", message_type.value)
         
     def _listen_blockchain(self):
         """Listen for new transactions on the blockchain"""
+        backoff = 0.1  # Retry delay after an error; doubles per consecutive failure
         while self.running:
             try:
-                # Get new transactions since last processed block
+                # Sleep until a block beyond the last processed one is appended
+                tip = self.blockchain.wait_for_block(self.last_processed_block, timeout=1.0)
+                if tip is None:
+                    continue
+                    
+                # Get new transactions since last processed block, up to the
+                # tip seen under the lock so nothing past it is skipped later
                 transactions = self.blockchain.get_transactions_for_node(
                     self.node_id, 
-                    self.last_processed_block
+                    self.last_processed_block + 1,
+                    tip
                 )
                 
-                for tx in transactions:
-                    self._process_transaction(tx)
-                    # Update last processed block
-                    if 'block_index' in tx:
-                        self.last_processed_block = max(self.last_processed_block, tx['block_index'])
+                self._dispatch_transactions(transactions)
                 
-                time.sleep(0.1)  # Poll every 100ms for real-time performance
+                # Every block up to the tip is processed, including blocks
+                # without messages for this node
+                self.last_processed_block = tip
+                backoff = 0.1
                 
             except Exception as e:
                 self.logger.error(f"Error in blockchain listener: {e}")
-                time.sleep(1)
+                # Jitter keeps many listeners from retrying in lockstep after an outage
+                time.sleep(backoff + random.random() * backoff)
+                backoff = min(30.0, backoff * 2)
+                
+    def _dispatch_transactions(self, transactions: List[Dict]):
+        """Process transactions in order, handing same-type runs to batch handlers"""
+        if not self._has_batch_handlers:
+            for tx in transactions:
+                self._process_transaction(tx)
+            return
+            
+        # Only consecutive runs are batched so message order is preserved
+        for msg_type_str, run in itertools.groupby(transactions, key=lambda tx: tx.get('type')):
+            run = list(run)
+            type_id = _MSG_TYPE_ID_BY_VALUE.get(msg_type_str)
+            handlers = self.batch_handlers[type_id] if type_id is not None else None
+                
+            if not handlers:
+                for tx in run:
+                    self._process_transaction(tx)
+                continue
                 
+            self.logger.debug("Processing %d %s messages", len(run), msg_type_str)
+            for handler in handlers:
+                try:
+                    handler(run)
+                except Exception as e:
+                    self.logger.error(f"Error processing {msg_type_str} batch: {e}")
+                    
     def _process_transaction(self, transaction: Dict):
         """Process a received transaction"""
         try:
             msg_type_str = transaction.get('type')
-            msg_type = MessageType(msg_type_str)
+            type_id = _MSG_TYPE_ID_BY_VALUE.get(msg_type_str)
+            if type_id is None:
+                self.logger.error(f"Error processing transaction: unknown message type {msg_type_str!r}")
+                return
             
-            self.logger.debug(f"Processing message: {msg_type.value} from {transaction.get('from')}")
+            self.logger.debug("Processing message: %s from %s", msg_type_str, transaction.get('from'))
             
             # Call registered handlers
-            if msg_type in self.message_handlers:
-                for handler in self.message_handlers[msg_type]:
+            handlers = self.message_handlers[type_id]
+            if handlers:
+                for handler in handlers:
                     handler(transaction)
                     
         except Exception as e:
@@ -195,11 +278,11 @@ class FSDPProtocol:
                 'from': self.node_id,
                 'to': to_node,
                 'data': data,
-                'message_id': str(uuid.uuid4())
+                'message_id': f"{self._msg_prefix}-{next(self._msg_seq):x}"
             }
             
             result = self.blockchain.add_transaction(transaction)
-            self.logger.debug(f"Message sent: {message_type.value} to {to_node}")
+            self.logger.debug("Message sent: %s to %s", message_type.value, to_node)
             return result
             
         except Exception as e:
@@ -221,7 +304,7 @@ class FSDPProtocol:
             return None
             
         session_id = str(uuid.uuid4())
-        session = FSDPSession(session_id, self.node_id, target_id)
+        session = FSDPSession(session_id, self.node_id, target_id, self.node_id)
         self.sessions[session_id] = session
         
         # Send session open message
@@ -254,7 +337,7 @@ class FSDPProtocol:
         session_id = session_data['session_id']
         admin_id = session_data['admin_id']
         
-        session = FSDPSession(session_id, admin_id, self.node_id)
+        session = FSDPSession(session_id, admin_id, self.node_id, self.node_id)
         self.sessions[session_id] = session
         
         # Send response
@@ -273,20 +356,20 @@ class FSDPProtocol:
         
     def close_session(self, session_id: str):
         """Close a session"""
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            session.is_active = False
-            
-            # Notify the other party
-            other_node = session.target_id if self.node_type == 'admin' else session.admin_id
-            self.send_message(
-                other_node,
-                MessageType.SESSION_CLOSE,
-                {'session_id': session_id}
-            )
+        session = self.sessions.pop(session_id, None)
+        if session is None:
+            return
             
-            del self.sessions[session_id]
-            self.logger.info(f"Session closed: {session_id}")
+        session.is_active = False
+        
+        # Notify the other party
+        self.send_message(
+            session.other_node,
+            MessageType.SESSION_CLOSE,
+            {'session_id': session_id}
+        )
+        
+        self.logger.info(f"Session closed: {session_id}")
             
     def create_terminal(self, session_id: str) -> Optional[str]:
         """
@@ -298,12 +381,12 @@ class FSDPProtocol:
         Returns:
             Terminal ID if successful
         """
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             self.logger.error(f"Session not found: {session_id}")
             return None
             
         terminal_id = str(uuid.uuid4())
-        session = self.sessions[session_id]
         
         terminal_info = {
             'terminal_id': terminal_id,
@@ -336,12 +419,11 @@ class FSDPProtocol:
             terminal_id: Terminal ID
             command: Command to execute
         """
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             self.logger.error(f"Session not found: {session_id}")
             return
             
-        session = self.sessions[session_id]
-        
         self.send_message(
             session.target_id,
             MessageType.TERMINAL_COMMAND,
@@ -352,22 +434,24 @@ class FSDPProtocol:
             }
         )
         
-        self.logger.debug(f"Command sent to terminal {terminal_id}: {command[:50]}")
+        self.logger.debug("Command sent to terminal %s: %.50s", terminal_id, command)
         
     def send_heartbeat(self, session_id: str):
         """Send heartbeat to keep session alive"""
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            session.update_heartbeat()
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
             
-            other_node = session.target_id if self.node_type == 'admin' else session.admin_id
-            self.send_message(
-                other_node,
-                MessageType.SESSION_HEARTBEAT,
-                {'session_id': session_id}
-            )
+        session.update_heartbeat()
+        
+        self.send_message(
+            session.other_node,
+            MessageType.SESSION_HEARTBEAT,
+            {'session_id': session_id}
+        )
             
     def get_active_sessions(self) -> List[Dict]:
         """Get all active sessions"""
-        return [session.to_dict() for session in self.sessions.values() if session.is_active]
+        clock_offset = time.time() - time.monotonic()
+        return [session.to_dict(clock_offset) for session in self.sessions.values() if session.is_active]
 
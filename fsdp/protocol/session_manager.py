@@ -8,20 +8,30 @@ import json
 import os
 import time
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 import pickle
+import heapq
+import queue
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Leading byte of every snapshot (and legacy .session) file; bump when the stored layout changes
+SESSION_FORMAT_VERSION = 1
+
+# Append-only session log and its periodic snapshot, both kept in storage_dir
+WAL_FILE = "sessions.log"
+SNAPSHOT_FILE = "sessions.snap"
+WAL_COMPACT_ENTRIES = 1000  # Log entries written before a new snapshot is taken
+WRITE_QUEUE_SIZE = 10000  # Pending session writes before state changes block on the writer
 
 
 class SessionState:
     """Persistent session state"""
     
+    __slots__ = ('session_id', 'admin_id', 'target_id', 'created_at', 'last_active',
+                 'reconnect_count', 'is_connected', 'terminals', '_lock')
+    
     def __init__(self, session_id: str, admin_id: str, target_id: str):
         self.session_id = session_id
         self.admin_id = admin_id
@@ -31,6 +41,13 @@ class SessionState:
         self.reconnect_count = 0
         self.is_connected = True
         self.terminals: Dict[str, 'TerminalState'] = {}
+        self._lock = threading.RLock()  # Guards this session's fields and terminals
+        
+    def __setstate__(self, state: Dict):
+        """Restore from a legacy pickle, which stores attributes as a plain dict"""
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._lock = threading.RLock()
         
     def to_dict(self) -> Dict:
         return {
@@ -43,32 +60,61 @@ class SessionState:
             'is_connected': self.is_connected,
             'terminals': {tid: t.to_dict() for tid, t in self.terminals.items()}
         }
+        
+    def _to_state(self) -> Dict:
+        """Full persisted form of the session, read back by from_dict()"""
+        state = self.to_dict()
+        state['terminals'] = {tid: t._to_state() for tid, t in self.terminals.items()}
+        return state
+        
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SessionState':
+        """Rebuild a session from _to_state() output"""
+        session = cls(data['session_id'], data['admin_id'], data['target_id'])
+        session.created_at = data['created_at']
+        session.last_active = data['last_active']
+        session.reconnect_count = data['reconnect_count']
+        session.is_connected = data['is_connected']
+        session.terminals = {tid: TerminalState.from_dict(t) for tid, t in data['terminals'].items()}
+        return session
 
 
 class TerminalState:
     """State of an isolated terminal"""
     
+    __slots__ = ('terminal_id', 'session_id', 'created_at', 'is_active', 'command_count',
+                 'command_history', 'output_buffer', 'current_directory', 'environment_vars', 'process_id')
+    
+    OUTPUT_BUFFER_LINES = 1000  # Output lines kept per terminal
+    COMMAND_HISTORY_LIMIT = 1000  # Commands kept per terminal
+    
     def __init__(self, terminal_id: str, session_id: str):
         self.terminal_id = terminal_id
         self.session_id = session_id
         self.created_at = time.time()
         self.is_active = True
-        self.command_history: List[str] = []
-        self.output_buffer: List[str] = []
+        self.command_count = 0  # All commands run, including those dropped from command_history
+        self.command_history = deque(maxlen=self.COMMAND_HISTORY_LIMIT)
+        self.output_buffer = deque(maxlen=self.OUTPUT_BUFFER_LINES)
         self.current_directory = os.path.expanduser("~")
         self.environment_vars: Dict[str, str] = {}
         self.process_id: Optional[int] = None
         
+    def __setstate__(self, state: Dict):
+        """Restore from a legacy pickle, which stores attributes as a plain dict"""
+        self.command_count = len(state.get('command_history', ()))
+        for name, value in state.items():
+            setattr(self, name, value)
+            
     def add_command(self, command: str):
         """Add command to history"""
+        self.command_count += 1
         self.command_history.append(command)
         
     def add_output(self, output: str):
         """Add output to buffer"""
+        # The deque drops the oldest line once OUTPUT_BUFFER_LINES is reached
         self.output_buffer.append(output)
-        # Keep only last 1000 lines
-        if len(self.output_buffer) > 1000:
-            self.output_buffer = self.output_buffer[-1000:]
             
     def to_dict(self) -> Dict:
         return {
@@ -76,10 +122,32 @@ class TerminalState:
             'session_id': self.session_id,
             'created_at': self.created_at,
             'is_active': self.is_active,
-            'command_count': len(self.command_history),
+            'command_count': self.command_count,
             'current_directory': self.current_directory,
             'process_id': self.process_id
         }
+        
+    def _to_state(self) -> Dict:
+        """Full persisted form of the terminal, read back by from_dict()"""
+        state = self.to_dict()
+        state['command_history'] = list(self.command_history)
+        state['output_buffer'] = list(self.output_buffer)
+        state['environment_vars'] = self.environment_vars
+        return state
+        
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TerminalState':
+        """Rebuild a terminal from _to_state() output"""
+        terminal = cls(data['terminal_id'], data['session_id'])
+        terminal.created_at = data['created_at']
+        terminal.is_active = data['is_active']
+        terminal.command_history.extend(data.get('command_history', []))
+        terminal.command_count = data.get('command_count', len(terminal.command_history))
+        terminal.output_buffer.extend(data.get('output_buffer', []))
+        terminal.current_directory = data['current_directory']
+        terminal.environment_vars = dict(data.get('environment_vars', {}))
+        terminal.process_id = data['process_id']
+        return terminal
 
 
 class SessionManager:
@@ -91,7 +159,19 @@ class SessionManager:
     def __init__(self, storage_dir: str = "./fsdp_sessions"):
         self.storage_dir = storage_dir
         self.sessions: Dict[str, SessionState] = {}
-        self.lock = threading.Lock()
+        self._dirty = set()  # IDs of sessions changed since they were last saved
+        self.lock = threading.Lock()  # Guards inserts into and deletes from self.sessions
+        self._sessions_snapshot = ()  # Immutable copy of self.sessions values for lock-free readers
+        # (last_active, session_id) of disconnected sessions, oldest first; entries may be stale
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._wal_lock = threading.Lock()  # Serializes writes to the session log
+        # ('update' | 'delete', session_id) items drained by the persist thread; None stops it
+        self._write_q: queue.Queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._wal_path = os.path.join(storage_dir, WAL_FILE)
+        self._snapshot_path = os.path.join(storage_dir, SNAPSHOT_FILE)
+        self._wal_entries = 0
+        self._wal_seq = 0  # Sequence number of the last log entry; snapshots record the one they cover
+        self._legacy_files: List[str] = []
         self.logger = logging.getLogger("SessionManager")
         
         # Create storage directory
@@ -99,6 +179,11 @@ class SessionManager:
         
         # Load existing sessions
         self._load_sessions()
+        self._sessions_snapshot = tuple(self.sessions.values())
+        self._expiry_heap = [(session.last_active, session.session_id)
+                             for session in self._sessions_snapshot if not session.is_connected]
+        heapq.heapify(self._expiry_heap)
+        self._wal = open(self._wal_path, 'ab')
         
         # Start background persistence thread
         self.running = True
@@ -108,54 +193,211 @@ class SessionManager:
         self.logger.info(f"Session Manager initialized with storage: {storage_dir}")
         
     def _load_sessions(self):
-        """Load persisted sessions from disk"""
+        """Load persisted sessions from disk: legacy files, then the snapshot, then the log"""
+        # Each source is loaded on its own, so a damaged one does not hide the others
         try:
-            session_files = [f for f in os.listdir(self.storage_dir) if f.endswith('.session')]
-            for session_file in session_files:
-                file_path = os.path.join(self.storage_dir, session_file)
-                try:
-                    with open(file_path, 'rb') as f:
-                        session_state = pickle.load(f)
-                        self.sessions[session_state.session_id] = session_state
-                        self.logger.info(f"Loaded session: {session_state.session_id}")
-                except Exception as e:
-                    self.logger.error(f"Failed to load session {session_file}: {e}")
+            # Sessions saved one file each by older versions; migrated at the next snapshot
+            with os.scandir(self.storage_dir) as entries:
+                session_files = [e.path for e in entries if e.name.endswith('.session') and e.is_file()]
+            if session_files:
+                # Read files concurrently; results are applied in this thread
+                with ThreadPoolExecutor(max_workers=min(8, len(session_files))) as pool:
+                    results = list(pool.map(self._try_read_session_file, session_files))
+                for file_path, session_state, error in results:
+                    if error is not None:
+                        self.logger.error(f"Failed to load session {os.path.basename(file_path)}: {error}")
+                        continue
+                    self.sessions[session_state.session_id] = session_state
+                    self._legacy_files.append(file_path)
+                    self.logger.info(f"Loaded session: {session_state.session_id}")
         except Exception as e:
-            self.logger.error(f"Failed to load sessions: {e}")
+            self.logger.error(f"Failed to load legacy session files: {e}")
             
+        try:
+            self._wal_seq = self._load_snapshot()
+        except Exception as e:
+            self.logger.error(f"Failed to load session snapshot: {e}")
+            
+        try:
+            snapshot_seq = self._wal_seq
+            if os.path.exists(self._wal_path):
+                with open(self._wal_path, 'rb') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # Torn final line from an interrupted write
+                            break
+                        self._wal_entries += 1
+                        seq = entry.get('seq')
+                        if seq is not None:
+                            if seq <= snapshot_seq:
+                                # Already in the snapshot; the log was not truncated after it
+                                continue
+                            self._wal_seq = max(self._wal_seq, seq)
+                        self._apply_log_entry(entry)
+        except Exception as e:
+            self.logger.error(f"Failed to replay session log: {e}")
+            
+        self.logger.info(f"Loaded {len(self.sessions)} sessions")
+        
+    def _load_snapshot(self) -> int:
+        """Load the snapshot file, returning the sequence number of the last log entry it covers"""
+        if not os.path.exists(self._snapshot_path):
+            return 0
+        with open(self._snapshot_path, 'rb') as f:
+            data = f.read()
+        if not data:
+            self.logger.warning("Session snapshot is empty, ignoring it")
+            return 0
+        if data[0] != SESSION_FORMAT_VERSION:
+            raise ValueError(f"unsupported snapshot format version {data[0]}")
+            
+        snapshot = json.loads(data[1:])
+        if isinstance(snapshot, list):
+            # Snapshots written before sequence numbers were added
+            snapshot = {'seq': 0, 'sessions': snapshot}
+        for state in snapshot['sessions']:
+            session_state = SessionState.from_dict(state)
+            self.sessions[session_state.session_id] = session_state
+        return snapshot['seq']
+        
+    def _apply_log_entry(self, entry: Dict):
+        """Replay one session log entry"""
+        if entry['op'] == 'update':
+            session_state = SessionState.from_dict(entry['state'])
+            self.sessions[session_state.session_id] = session_state
+        elif entry['op'] == 'delete':
+            self.sessions.pop(entry['session_id'], None)
+            
+    def _try_read_session_file(self, file_path: str):
+        """Read a legacy .session file, returning (path, state, error)"""
+        try:
+            return file_path, self._read_session_file(file_path), None
+        except Exception as e:
+            return file_path, None, e
+            
+    def _read_session_file(self, file_path: str) -> SessionState:
+        """Read one legacy .session file (versioned JSON, or a pickle)"""
+        with open(file_path, 'rb') as f:
+            data = f.read()
+            
+        if data[:1] == b'\x80':
+            # Files written before the JSON format are pickles holding plain lists
+            session_state = pickle.loads(data)
+            for terminal in session_state.terminals.values():
+                terminal.command_history = deque(terminal.command_history, maxlen=TerminalState.COMMAND_HISTORY_LIMIT)
+                terminal.output_buffer = deque(terminal.output_buffer, maxlen=TerminalState.OUTPUT_BUFFER_LINES)
+            return session_state
+        if data[0] != SESSION_FORMAT_VERSION:
+            raise ValueError(f"unsupported session format version {data[0]}")
+        return SessionState.from_dict(json.loads(data[1:]))
+        
+    def _append_log(self, entry: Dict):
+        """Append an entry to the session log, snapshotting once the log grows large"""
+        with self._wal_lock:
+            if self._wal.closed:
+                return
+            # Numbered under the lock so log order and sequence order agree
+            self._wal_seq += 1
+            entry['seq'] = self._wal_seq
+            self._wal.write(json.dumps(entry).encode() + b'\n')
+            self._wal.flush()
+            self._wal_entries += 1
+            if self._wal_entries >= WAL_COMPACT_ENTRIES:
+                self._write_snapshot()
+                
+    def _write_snapshot(self):
+        """Write every session to the snapshot file and empty the log (caller holds _wal_lock)"""
+        states = []
+        for session in self._sessions_snapshot:
+            with session._lock:
+                states.append(session._to_state())
+        snapshot = {'seq': self._wal_seq, 'sessions': states}
+        payload = bytes([SESSION_FORMAT_VERSION]) + json.dumps(snapshot).encode()
+        
+        # Swap the snapshot in atomically; if the log is not truncated after
+        # this, the recorded seq keeps its entries from being replayed
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, self._snapshot_path)
+        
+        self._wal.seek(0)
+        self._wal.truncate()
+        self._wal_entries = 0
+        
+        # Legacy per-session files are now covered by the snapshot
+        for file_path in self._legacy_files:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self._legacy_files = []
+        self.logger.debug("Session snapshot written")
+        
     def _save_session(self, session_id: str):
         """Save a session to disk"""
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             return
             
+        # Callers must not hold session._lock here: _append_log may take
+        # _wal_lock and then every session lock to write a snapshot
+        self._dirty.discard(session_id)
         try:
-            session_state = self.sessions[session_id]
-            file_path = os.path.join(self.storage_dir, f"{session_id}.session")
-            with open(file_path, 'wb') as f:
-                pickle.dump(session_state, f)
-            self.logger.debug(f"Session saved: {session_id}")
+            with session._lock:
+                state = session._to_state()
+            self._append_log({'op': 'update', 'state': state})
+            self.logger.debug("Session saved: %s", session_id)
         except Exception as e:
+            self._dirty.add(session_id)
             self.logger.error(f"Failed to save session {session_id}: {e}")
             
+    def mark_dirty(self, session_id: str):
+        """Flag a session whose state was changed directly so the next persist pass saves it"""
+        if session_id in self.sessions:
+            self._dirty.add(session_id)
+            
+    def _queue_write(self, op: str, session_id: str):
+        """Hand a session save or delete to the persist thread"""
+        self._write_q.put((op, session_id))
+        
+    def _write_queued(self, op: str, session_id: str):
+        """Perform one queued write (persist thread, or shutdown once it has stopped)"""
+        if op == 'update':
+            self._save_session(session_id)
+        elif op == 'delete':
+            self._append_log({'op': 'delete', 'session_id': session_id})
+            
     def _auto_persist(self):
-        """Automatically persist sessions every 10 seconds"""
-        while self.running:
+        """Write queued session changes, and save sessions marked dirty every 10 seconds"""
+        next_sweep = time.monotonic() + 10
+        while True:
+            try:
+                item = self._write_q.get(timeout=max(0.0, next_sweep - time.monotonic()))
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+                
             try:
-                with self.lock:
-                    for session_id in list(self.sessions.keys()):
+                if item:
+                    self._write_queued(*item)
+                if time.monotonic() >= next_sweep:
+                    for session_id in list(self._dirty):
                         self._save_session(session_id)
-                time.sleep(10)
+                    next_sweep = time.monotonic() + 10
             except Exception as e:
                 self.logger.error(f"Error in auto-persist: {e}")
                 
     def create_session(self, session_id: str, admin_id: str, target_id: str) -> SessionState:
         """Create a new session"""
+        session_state = SessionState(session_id, admin_id, target_id)
         with self.lock:
-            session_state = SessionState(session_id, admin_id, target_id)
             self.sessions[session_id] = session_state
-            self._save_session(session_id)
-            self.logger.info(f"Session created: {session_id}")
-            return session_state
+            self._sessions_snapshot = tuple(self.sessions.values())
+        self._queue_write('update', session_id)
+        self.logger.info(f"Session created: {session_id}")
+        return session_state
             
     def get_session(self, session_id: str) -> Optional[SessionState]:
         """Get a session by ID"""
@@ -163,65 +405,81 @@ class SessionManager:
         
     def update_session_activity(self, session_id: str):
         """Update last activity timestamp"""
-        if session_id in self.sessions:
-            self.sessions[session_id].last_active = time.time()
+        session = self.sessions.get(session_id)
+        if session is not None:
+            with session._lock:
+                session.last_active = time.time()
+            self._dirty.add(session_id)
             
     def reconnect_session(self, session_id: str) -> bool:
         """
         Reconnect to an existing session
         Returns True if session exists and can be reconnected
         """
-        with self.lock:
-            if session_id not in self.sessions:
-                self.logger.warning(f"Session not found for reconnection: {session_id}")
-                return False
-                
-            session = self.sessions[session_id]
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.logger.warning(f"Session not found for reconnection: {session_id}")
+            return False
+            
+        with session._lock:
             session.is_connected = True
             session.reconnect_count += 1
             session.last_active = time.time()
-            self._save_session(session_id)
-            
-            self.logger.info(f"Session reconnected: {session_id} (reconnect count: {session.reconnect_count})")
-            return True
+            reconnect_count = session.reconnect_count
+        self._queue_write('update', session_id)
+        
+        self.logger.info(f"Session reconnected: {session_id} (reconnect count: {reconnect_count})")
+        return True
             
     def disconnect_session(self, session_id: str):
         """Mark session as disconnected (but keep it for reconnection)"""
-        if session_id in self.sessions:
-            self.sessions[session_id].is_connected = False
-            self._save_session(session_id)
+        session = self.sessions.get(session_id)
+        if session is not None:
+            with session._lock:
+                session.is_connected = False
+                last_active = session.last_active
+            with self.lock:
+                heapq.heappush(self._expiry_heap, (last_active, session_id))
+            self._queue_write('update', session_id)
             self.logger.info(f"Session disconnected: {session_id}")
             
     def delete_session(self, session_id: str):
         """Permanently delete a session"""
         with self.lock:
-            if session_id in self.sessions:
-                # Close all terminals
-                session = self.sessions[session_id]
-                for terminal_id in list(session.terminals.keys()):
-                    self.close_terminal(session_id, terminal_id)
-                    
-                # Delete from memory and disk
-                del self.sessions[session_id]
-                file_path = os.path.join(self.storage_dir, f"{session_id}.session")
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    
-                self.logger.info(f"Session deleted: {session_id}")
+            session = self.sessions.pop(session_id, None)
+            self._sessions_snapshot = tuple(self.sessions.values())
+        if session is None:
+            return
+            
+        # Close all terminals
+        with session._lock:
+            for terminal in session.terminals.values():
+                terminal.is_active = False
+            session.terminals.clear()
+            
+        # Delete from disk
+        self._dirty.discard(session_id)
+        self._queue_write('delete', session_id)
+        file_path = os.path.join(self.storage_dir, f"{session_id}.session")
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            
+        self.logger.info(f"Session deleted: {session_id}")
                 
     def create_terminal(self, session_id: str, terminal_id: str) -> Optional[TerminalState]:
         """Create a new isolated terminal in a session"""
-        with self.lock:
-            if session_id not in self.sessions:
-                self.logger.error(f"Session not found: {session_id}")
-                return None
-                
-            terminal_state = TerminalState(terminal_id, session_id)
-            self.sessions[session_id].terminals[terminal_id] = terminal_state
-            self._save_session(session_id)
+        session = self.sessions.get(session_id)
+        if session is None:
+            self.logger.error(f"Session not found: {session_id}")
+            return None
             
-            self.logger.info(f"Terminal created: {terminal_id} in session {session_id}")
-            return terminal_state
+        terminal_state = TerminalState(terminal_id, session_id)
+        with session._lock:
+            session.terminals[terminal_id] = terminal_state
+        self._queue_write('update', session_id)
+        
+        self.logger.info(f"Terminal created: {terminal_id} in session {session_id}")
+        return terminal_state
             
     def get_terminal(self, session_id: str, terminal_id: str) -> Optional[TerminalState]:
         """Get a terminal by ID"""
@@ -230,15 +488,47 @@ class SessionManager:
             return session.terminals.get(terminal_id)
         return None
         
+    def add_terminal_command(self, session_id: str, terminal_id: str, command: str) -> bool:
+        """Record a command run in a terminal; saved with the next persist pass"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return False
+            
+        with session._lock:
+            terminal = session.terminals.get(terminal_id)
+            if terminal is None:
+                return False
+            terminal.add_command(command)
+        self.mark_dirty(session_id)
+        return True
+        
+    def add_terminal_output(self, session_id: str, terminal_id: str, output: str) -> bool:
+        """Record output from a terminal; saved with the next persist pass"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return False
+            
+        with session._lock:
+            terminal = session.terminals.get(terminal_id)
+            if terminal is None:
+                return False
+            terminal.add_output(output)
+        self.mark_dirty(session_id)
+        return True
+        
     def close_terminal(self, session_id: str, terminal_id: str):
         """Close a terminal"""
-        with self.lock:
-            session = self.sessions.get(session_id)
-            if session and terminal_id in session.terminals:
-                session.terminals[terminal_id].is_active = False
-                del session.terminals[terminal_id]
-                self._save_session(session_id)
-                self.logger.info(f"Terminal closed: {terminal_id}")
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+            
+        with session._lock:
+            terminal = session.terminals.pop(terminal_id, None)
+            if terminal is not None:
+                terminal.is_active = False
+        if terminal is not None:
+            self._queue_write('update', session_id)
+            self.logger.info(f"Terminal closed: {terminal_id}")
                 
     def get_session_terminals(self, session_id: str) -> List[TerminalState]:
         """Get all terminals in a session"""
@@ -249,37 +539,59 @@ class SessionManager:
         
     def get_active_sessions(self) -> List[SessionState]:
         """Get all active (connected) sessions"""
-        return [s for s in self.sessions.values() if s.is_connected]
+        return [s for s in self._sessions_snapshot if s.is_connected]
         
     def get_all_sessions(self) -> List[SessionState]:
         """Get all sessions (including disconnected)"""
-        return list(self.sessions.values())
+        return list(self._sessions_snapshot)
         
     def cleanup_old_sessions(self, max_age_hours: int = 24):
         """Clean up sessions older than max_age_hours"""
+        cutoff = time.time() - max_age_hours * 3600
+        
+        # Pop only heap entries older than the cutoff instead of scanning every session
+        sessions_to_delete = []
         with self.lock:
-            current_time = time.time()
-            max_age_seconds = max_age_hours * 3600
+            while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+                last_active, session_id = heapq.heappop(self._expiry_heap)
+                session = self.sessions.get(session_id)
+                if session is None or session.is_connected:
+                    continue
+                if session.last_active != last_active:
+                    # Activity since the entry was pushed; requeue at its real age
+                    heapq.heappush(self._expiry_heap, (session.last_active, session_id))
+                    continue
+                sessions_to_delete.append(session_id)
             
-            sessions_to_delete = []
-            for session_id, session in self.sessions.items():
-                if not session.is_connected and (current_time - session.last_active) > max_age_seconds:
-                    sessions_to_delete.append(session_id)
-                    
-            for session_id in sessions_to_delete:
-                self.delete_session(session_id)
-                self.logger.info(f"Cleaned up old session: {session_id}")
+        for session_id in sessions_to_delete:
+            self.delete_session(session_id)
+            self.logger.info(f"Cleaned up old session: {session_id}")
                 
     def shutdown(self):
         """Shutdown session manager"""
         self.running = False
         if self.persist_thread:
+            self._write_q.put(None)
             self.persist_thread.join(timeout=2)
             
-        # Final save of all sessions
-        with self.lock:
-            for session_id in self.sessions.keys():
-                self._save_session(session_id)
+        # Final save of queued writes and sessions with unsaved changes
+        while True:
+            try:
+                item = self._write_q.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._write_queued(*item)
+        for session_id in list(self._dirty):
+            self._save_session(session_id)
+                
+        # Compact the log so the next start loads a single snapshot
+        with self._wal_lock:
+            try:
+                self._write_snapshot()
+            except Exception as e:
+                self.logger.error(f"Failed to write session snapshot: {e}")
+            self._wal.close()
                 
         self.logger.info("Session Manager shutdown complete")
 
